@@ -1,8 +1,11 @@
 from fastapi import APIRouter
 from .routes.generate import router as generate_router
+from .routes.progress import router as progress_router
+from .routes.outputs import router as outputs_router
 
 
 api_router = APIRouter()
 
 api_router.include_router(generate_router, prefix="/generate", tags=["generate"])
-
+api_router.include_router(progress_router, tags=["progress"])
+api_router.include_router(outputs_router, tags=["outputs"])
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from app.models.request_models import GenerateRequest
-from app.models.response_models import GenerateResponse
+from app.models.response_models import GenerateResponse, TaskSubmitResponse, TaskStatusResponse
 
-from app.services import run_research_pipeline
+from app.services import LLMUnavailableError, run_research_pipeline, submit_job, get_job
 from app.core import get_settings
 
-import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -21,15 +23,21 @@ async def generate_report(payload: GenerateRequest):
         # MUST await!
         result = await run_research_pipeline(payload.topic, payload.max_sources, payload.theme_config)
 
-    except Exception as e:
-        print("\n\n===== PIPELINE CRASHED =====")
-        traceback.print_exc()
-        print("===== END ERROR =====\n\n")
+    except LLMUnavailableError as e:
+        logger.warning("LLM provider unavailable for topic %r: %s", payload.topic, e)
+        raise HTTPException(status_code=503, detail=str(e))
 
+    except Exception as e:
+        logger.exception("Pipeline crashed for topic %r", payload.topic)
         raise HTTPException(status_code=500, detail=str(e))
 
+    # The pipeline stopped early (e.g. the source search failed)
+    if result.get("status") != "DONE":
+        logger.warning("Pipeline stopped for topic %r: %s", payload.topic, result.get("message"))
+        raise HTTPException(status_code=502, detail=result.get("message") or "Pipeline did not complete")
+
     ppt_filename = result["ppt_filename"]
-    ppt_url = f"{settings.backend_host}/outputs/{ppt_filename}"
+    ppt_url = settings.outputs_url_prefix + ppt_filename
 
     return GenerateResponse(
         topic=result.get("topic"),
@@ -39,3 +47,32 @@ async def generate_report(payload: GenerateRequest):
         summary=result.get("summary"),
         key_points=result.get("key_points"),
     )
+
+
+@router.post("/tasks", response_model=TaskSubmitResponse, status_code=202)
+async def submit_report_task(payload: GenerateRequest):
+    """
+    Start the pipeline in the background and return its task_id immediately.
+    Follow progress on /ws/progress by sending {"task_id": ...}.
+    """
+    job = submit_job(payload.topic, payload.max_sources, payload.theme_config)
+    return TaskSubmitResponse(task_id=job.task_id, status=job.status)
+
+
+@router.get("/tasks/{task_id}", response_model=TaskStatusResponse)
+async def get_report_task(task_id: str):
+    job = get_job(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown task_id")
+
+    settings = get_settings()
+    ppt_filename = job.result["ppt_filename"] if job.result else None
+
+    return TaskStatusResponse(
+        task_id=job.task_id,
+        status=job.status,
+        topic=job.topic,
+        message=job.events[-1].get("message") if job.events else None,
+        ppt_filename=ppt_filename,
+        ppt_url=settings.outputs_url_prefix + ppt_filename if ppt_filename else None,
+    )
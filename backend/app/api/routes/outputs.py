@@ -0,0 +1,31 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from app.core import get_settings
+
+router = APIRouter()
+
+
+@router.get("/outputs/{filename}")
+async def download_output(filename: str):
+    """
+    Serve a generated deck or chart. The stat result is passed in so Starlette
+    doesn't stat the file again on the thread pool, and servers that support
+    the pathsend extension can send the file without copying it through Python.
+    In production, put nginx in front of /outputs/ to offload downloads entirely.
+    """
+    settings = get_settings()
+
+    # Only plain filenames inside outputs_dir; no path traversal
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    path = os.path.join(settings.outputs_dir, filename)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return FileResponse(path, stat_result=stat_result, filename=filename)
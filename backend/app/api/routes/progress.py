@@ -1,28 +1,126 @@
+import asyncio
+import itertools
+import logging
+
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.services import run_research_pipeline_stream
+from app.services import run_research_pipeline_stream, get_job
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Marks the end of the pipeline stream on the event queue
+_STREAM_END = object()
+
+# Progress events buffered per connection before a slow client forces drops
+PROGRESS_QUEUE_SIZE = 256
+
+# Frames above this size are logged; they usually mean an event carries a full payload
+LARGE_FRAME_BYTES = 64 * 1024
+
+
+def _is_terminal(event) -> bool:
+    return event.get("status") in ("DONE", "error")
+
+
+async def _produce_events(queue: asyncio.Queue, events):
+    """
+    Pump pipeline events into the bounded queue, always finishing with
+    _STREAM_END. Every event gets a monotonically increasing seq. When the
+    client falls behind, progress events are dropped rather than stalling the
+    pipeline, and a {"dropped": k, "last_seq": s} marker is queued before the
+    next event that fits. Terminal events are never dropped.
+    """
+    seq = itertools.count(1)
+    dropped = 0
+    last_dropped_seq = 0
+
+    try:
+        async for event in events:
+            # Copy: job events are shared between all of a job's followers
+            event = {**event, "seq": next(seq)}
+
+            if _is_terminal(event):
+                if dropped:
+                    await queue.put({"dropped": dropped, "last_seq": last_dropped_seq})
+                    dropped = 0
+                await queue.put(event)
+                continue
+
+            # A pending drop marker needs a slot of its own
+            room = queue.maxsize - queue.qsize()
+            if room >= (2 if dropped else 1):
+                if dropped:
+                    queue.put_nowait({"dropped": dropped, "last_seq": last_dropped_seq})
+                    dropped = 0
+                queue.put_nowait(event)
+            else:
+                dropped += 1
+                last_dropped_seq = event["seq"]
+    except Exception as e:
+        await queue.put({"status": "error", "message": str(e)})
+    finally:
+        await queue.put(_STREAM_END)
+
+
+async def _next_batch(queue: asyncio.Queue):
+    """
+    Block until one event is available, then drain everything else that is
+    already queued. Returns (events, finished).
+    """
+    batch = []
+    item = await queue.get()
+    while item is not _STREAM_END:
+        batch.append(item)
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return batch, False
+    return batch, True
+
 
 @router.websocket("/ws/progress")
 async def websocket_progress(ws: WebSocket):
     await ws.accept()
+    producer = None
 
     try:
-        # 1) Receive initial config from frontend
+        # 1) Receive initial config from frontend: either follow a task
+        #    submitted via POST /generate/tasks, or run a pipeline inline
         data = await ws.receive_json()
-        topic = data.get("topic")
-        max_sources = data.get("max_sources", 5)
+        task_id = data.get("task_id")
+        if task_id:
+            job = get_job(task_id)
+            if job is None:
+                await ws.send_bytes(orjson.dumps({"error": f"Unknown task_id: {task_id}"}))
+                return
+            events = job.follow()
+        else:
+            topic = data.get("topic")
+            max_sources = data.get("max_sources", 5)
+            events = run_research_pipeline_stream(topic, max_sources)
+
+        # 2) Stream progress events, coalescing bursts into one frame
+        queue: asyncio.Queue = asyncio.Queue(maxsize=PROGRESS_QUEUE_SIZE)
+        producer = asyncio.create_task(_produce_events(queue, events))
 
-        # 2) Stream progress events async
-        async for event in run_research_pipeline_stream(topic, max_sources):
-            await ws.send_json(event)
+        finished = False
+        while not finished:
+            batch, finished = await _next_batch(queue)
+            if batch:
+                frame = orjson.dumps({"batch": batch})
+                if len(frame) > LARGE_FRAME_BYTES:
+                    logger.warning("Large progress frame: %d bytes, %d events", len(frame), len(batch))
+                await ws.send_bytes(frame)
 
     except WebSocketDisconnect:
-        print("❌ WebSocket disconnected")
+        logger.info("Progress WebSocket disconnected")
 
     except Exception as e:
-        await ws.send_json({"error": str(e)})
+        await ws.send_bytes(orjson.dumps({"error": str(e)}))
 
     finally:
+        if producer is not None and not producer.done():
+            producer.cancel()
         await ws.close()
@@ -1,136 +1,241 @@
+import io
 import os
-from typing import List, Dict, Any
-import matplotlib.pyplot as plt
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
+import numpy as np
 
-def _get_theme_colors(theme_config: Dict[str, Any] = None) -> Dict[str, str]:
+from app.core.config import get_settings
+
+# matplotlib is imported lazily: only the render worker processes need it,
+# so API workers that never draw a chart don't pay its import time or RSS.
+
+def _pyplot():
+    """Import pyplot (cached by Python after the first call) on the headless Agg backend."""
+    import matplotlib
+    matplotlib.use("Agg")  # must run before pyplot is imported
+    import matplotlib.pyplot as plt
+    plt.ioff()
+    return plt
+
+
+def _init_worker():
+    """Pool initializer: load matplotlib with the headless backend up front."""
+    _pyplot()
+
+
+# Rendering is CPU-bound, so it runs in worker processes to keep the
+# event loop (and the GIL) free. Workers do the full render and return
+# PNG bytes since Figure objects cannot cross process boundaries.
+# The pipeline builds decks in the same pool. Workers are spawned rather
+# than forked: the API process already runs threads (logging listener,
+# to_thread workers), and forking a threaded process can deadlock.
+@lru_cache(maxsize=1)
+def render_pool() -> ProcessPoolExecutor:
+    """The worker pool, created on first use and sized by RENDER_WORKERS."""
+    return ProcessPoolExecutor(
+        max_workers=get_settings().render_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+
+@dataclass(slots=True, frozen=True)
+class ThemeColors:
+    primary: str
+    secondary: str
+    accent: str
+    bg: str
+    text: str
+
+@lru_cache(maxsize=32)
+def _theme_colors(primary: str, secondary: str, accent: str, bg: str, text: str) -> ThemeColors:
+    return ThemeColors(primary, secondary, accent, bg, text)
+
+def _get_theme_colors(theme_config: Dict[str, Any] = None) -> ThemeColors:
     tc = theme_config or {}
-    return {
-        'primary': tc.get('brand_primary', '#38BDF8'),
-        'secondary': tc.get('brand_secondary', '#818CF8'),
-        'accent': tc.get('accent_color', '#F472B6'),
-        'bg': tc.get('background_color', '#121212'),
-        'text': tc.get('text_color', '#F0F0F0')
-    }
+    return _theme_colors(
+        tc.get('brand_primary', '#38BDF8'),
+        tc.get('brand_secondary', '#818CF8'),
+        tc.get('accent_color', '#F472B6'),
+        tc.get('background_color', '#121212'),
+        tc.get('text_color', '#F0F0F0'),
+    )
+
+@lru_cache(maxsize=32)
+def _is_dark_background(bg: str) -> bool:
+    """Perceived-luminance check, so any light palette (not just pure white) gets the light style."""
+    from matplotlib.colors import to_rgb
+    try:
+        r, g, b = to_rgb(bg)
+    except ValueError:
+        return True  # unparseable colour: keep the dark default
+    return r * 0.299 + g * 0.587 + b * 0.114 < 0.5
+
+# Style last applied to this process's rcParams; re-applying a stylesheet
+# is expensive, so it only happens when the theme actually changes.
+_LAST_STYLE_KEY = None
 
 def _setup_plot_style(theme_config: Dict[str, Any]):
+    global _LAST_STYLE_KEY
     colors = _get_theme_colors(theme_config)
     # If background is light, use default style, else dark_background
-    # Simple heuristic: if bg is white-ish, use default
-    bg = colors['bg'].lower()
-    if bg in ['#ffffff', '#fff', 'white']:
-        plt.style.use('default')
-    else:
-        plt.style.use('dark_background')
-    
+    style = 'dark_background' if _is_dark_background(colors.bg) else 'default'
+
+    style_key = (style, colors.text)
+    if style_key == _LAST_STYLE_KEY:
+        return colors
+
+    plt = _pyplot()
+    plt.style.use(style)
+
     # Override specific params
     plt.rcParams['figure.facecolor'] = 'none' # Transparent figure
     plt.rcParams['axes.facecolor'] = 'none'   # Transparent axes
-    plt.rcParams['text.color'] = colors['text']
-    plt.rcParams['axes.labelcolor'] = colors['text']
-    plt.rcParams['xtick.color'] = colors['text']
-    plt.rcParams['ytick.color'] = colors['text']
+    plt.rcParams['text.color'] = colors.text
+    plt.rcParams['axes.labelcolor'] = colors.text
+    plt.rcParams['xtick.color'] = colors.text
+    plt.rcParams['ytick.color'] = colors.text
+    _LAST_STYLE_KEY = style_key
     return colors
 
-def _save_chart(fig, filename: str, output_dir: str) -> str:
-    """Save figure as transparent PNG and return file path."""
+# 16x9in @ 72 DPI = 1152x648 px, plenty for a full-width slide image
+CHART_DPI = 72
+
+# One reusable figure per (worker) process, created on first use.
+_FIG = None
+
+def _new_axes():
+    """Clear this process's shared 16x9 figure and return it with a fresh Axes."""
+    global _FIG
+    if _FIG is None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        _FIG = Figure(figsize=(16, 9))
+        FigureCanvasAgg(_FIG)
+    _FIG.clear()
+    return _FIG, _FIG.add_subplot(111)
+
+def _save_chart(fig, filename: str, output_dir: str) -> Tuple[str, bytes]:
+    """Encode figure as transparent PNG in memory and return (file path, PNG bytes).
+    The caller writes the file, keeping disk I/O off the render workers."""
     path = os.path.join(output_dir, filename)
-    fig.savefig(path, transparent=True, bbox_inches='tight', dpi=100)
-    plt.close(fig)
-    return path
+    # A single layout pass here; bbox_inches='tight' would render the figure twice
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', transparent=True, dpi=CHART_DPI)
+    return path, buf.getvalue()
 
-def generate_market_size_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> str:
+def _values(data: Dict[str, float]) -> np.ndarray:
+    """Chart values as a float64 array, so matplotlib skips its own list conversion."""
+    return np.fromiter(data.values(), dtype=np.float64, count=len(data))
+
+# Long line series only get every Nth point labelled
+MAX_POINT_LABELS = 20
+
+def _label_points(ax, values, fmt: str, color: str):
+    """Label line-chart points, thinning the labels out on long series."""
+    step = max(1, -(-len(values) // MAX_POINT_LABELS))
+    for i in range(0, len(values), step):
+        ax.text(i, values[i], fmt.format(values[i]), ha='center', color=color)
+
+def generate_market_size_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> Tuple[str, bytes]:
     colors = _setup_plot_style(theme_config)
-    fig, ax = plt.subplots(figsize=(16, 9))
+    fig, ax = _new_axes()
     years = list(data.keys())
-    values = list(data.values())
-    ax.plot(years, values, marker='o', color=colors['primary'], linewidth=4, markersize=10)
-    ax.fill_between(years, values, color=colors['primary'], alpha=0.2)
-    ax.set_title('Market Size Growth', fontsize=24, color=colors['primary'], pad=20)
-    ax.tick_params(colors=colors['text'], labelsize=12)
-    for i, v in enumerate(values):
-        ax.text(i, v, f"{v}", ha='center', color=colors['text'])
+    values = _values(data)
+    ax.plot(years, values, marker='o', color=colors.primary, linewidth=4, markersize=10)
+    ax.fill_between(years, values, color=colors.primary, alpha=0.2)
+    ax.set_title('Market Size Growth', fontsize=24, color=colors.primary, pad=20)
+    ax.tick_params(colors=colors.text, labelsize=12)
+    _label_points(ax, values, "{:g}", colors.text)
     return _save_chart(fig, 'chart_market_size.png', output_dir)
 
-def generate_market_share_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> str:
+def generate_market_share_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> Tuple[str, bytes]:
     colors = _setup_plot_style(theme_config)
-    fig, ax = plt.subplots(figsize=(16, 9))
+    fig, ax = _new_axes()
     labels = list(data.keys())
-    sizes = list(data.values())
+    sizes = _values(data)
     
     # Use theme colors for pie slices if possible, or fallback to a colormap
     # We can create a custom color list starting with primary, secondary, accent
-    pie_colors = [colors['primary'], colors['secondary'], colors['accent']]
+    pie_colors = [colors.primary, colors.secondary, colors.accent]
     # Fill rest with tab20
-    import matplotlib.cm as cm
     if len(labels) > 3:
+        from matplotlib import cm
         extra_colors = cm.tab20.colors
         pie_colors.extend(extra_colors)
     
     ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140, colors=pie_colors[:len(labels)],
-           textprops={'color': colors['text']})
-    ax.set_title('Market Share', fontsize=24, color=colors['primary'], pad=20)
+           textprops={'color': colors.text})
+    ax.set_title('Market Share', fontsize=24, color=colors.primary, pad=20)
     return _save_chart(fig, 'chart_market_share.png', output_dir)
 
-def generate_growth_projection_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> str:
+def generate_growth_projection_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> Tuple[str, bytes]:
     colors = _setup_plot_style(theme_config)
-    fig, ax = plt.subplots(figsize=(16, 9))
+    fig, ax = _new_axes()
     years = list(data.keys())
-    values = list(data.values())
-    ax.plot(years, values, marker='s', linestyle='--', color=colors['accent'], linewidth=4, markersize=10)
-    ax.set_title('Growth Projection', fontsize=24, color=colors['primary'], pad=20)
-    ax.tick_params(colors=colors['text'], labelsize=12)
-    for i, v in enumerate(values):
-        ax.text(i, v, f"{v}%", ha='center', color=colors['text'])
+    values = _values(data)
+    ax.plot(years, values, marker='s', linestyle='--', color=colors.accent, linewidth=4, markersize=10)
+    ax.set_title('Growth Projection', fontsize=24, color=colors.primary, pad=20)
+    ax.tick_params(colors=colors.text, labelsize=12)
+    _label_points(ax, values, "{:g}%", colors.text)
     return _save_chart(fig, 'chart_growth_projection.png', output_dir)
 
-def generate_competitors_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> str:
+def generate_competitors_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> Tuple[str, bytes]:
     colors = _setup_plot_style(theme_config)
-    fig, ax = plt.subplots(figsize=(16, 9))
+    fig, ax = _new_axes()
     companies = list(data.keys())
-    scores = list(data.values())
-    ax.bar(companies, scores, color=colors['secondary'])
-    ax.set_title('Competitor Comparison', fontsize=24, color=colors['primary'], pad=20)
-    ax.tick_params(colors=colors['text'], labelsize=12)
-    for i, v in enumerate(scores):
-        ax.text(i, v, f"{v}", ha='center', va='bottom', color=colors['text'])
+    scores = _values(data)
+    bars = ax.bar(companies, scores, color=colors.secondary)
+    ax.set_title('Competitor Comparison', fontsize=24, color=colors.primary, pad=20)
+    ax.tick_params(colors=colors.text, labelsize=12)
+    ax.bar_label(bars, labels=[f"{v:g}" for v in scores], color=colors.text)
     return _save_chart(fig, 'chart_competitors.png', output_dir)
 
-def generate_trends_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> str:
+def generate_trends_chart(data: Dict[str, float], output_dir: str, theme_config: Dict[str, Any]) -> Tuple[str, bytes]:
     colors = _setup_plot_style(theme_config)
-    fig, ax = plt.subplots(figsize=(16, 9))
+    fig, ax = _new_axes()
     trends = list(data.keys())
-    impact = list(data.values())
+    impact = _values(data)
     y_pos = range(len(trends))
-    ax.barh(y_pos, impact, color=colors['primary'])
+    ax.barh(y_pos, impact, color=colors.primary)
     ax.set_yticks(y_pos)
     ax.set_yticklabels(trends, fontsize=12)
     ax.invert_yaxis()
-    ax.set_title('Key Trends Impact', fontsize=24, color=colors['primary'], pad=20)
-    ax.tick_params(colors=colors['text'], labelsize=12)
+    ax.set_title('Key Trends Impact', fontsize=24, color=colors.primary, pad=20)
+    ax.tick_params(colors=colors.text, labelsize=12)
     return _save_chart(fig, 'chart_trends.png', output_dir)
 
-def generate_charts(slide_plan: Dict[str, Any], output_dir: str, theme_config: Dict[str, Any] = None) -> List[str]:
-    """Generate all requested charts based on slide_plan['chart_data'].
-    Returns list of file paths for the generated PNGs.
+_CHART_RENDERERS = {
+    'market_size': generate_market_size_chart,
+    'market_share': generate_market_share_chart,
+    'growth_projection': generate_growth_projection_chart,
+    'competitors': generate_competitors_chart,
+    'trends': generate_trends_chart,
+}
+
+async def render_charts(slide_plan: Dict[str, Any], output_dir: str,
+                        theme_config: Dict[str, Any] = None) -> List[Tuple[str, bytes]]:
+    """Render all requested charts concurrently in the process pool without writing them.
+    Returns (file path, PNG bytes) pairs; generate_ppt embeds the bytes directly.
     """
     chart_data = slide_plan.get('chart_data', {})
-    os.makedirs(output_dir, exist_ok=True)
-    generated: List[str] = []
-    
     # Ensure theme_config is not None
     theme_config = theme_config or {}
+    pending = [
+        (key, render_pool().submit(_CHART_RENDERERS[key], chart_data[key], output_dir, theme_config))
+        for key in _CHART_RENDERERS if key in chart_data
+    ]
 
-    try:
-        if 'market_size' in chart_data:
-            generated.append(generate_market_size_chart(chart_data['market_size'], output_dir, theme_config))
-        if 'market_share' in chart_data:
-            generated.append(generate_market_share_chart(chart_data['market_share'], output_dir, theme_config))
-        if 'growth_projection' in chart_data:
-            generated.append(generate_growth_projection_chart(chart_data['growth_projection'], output_dir, theme_config))
-        if 'competitors' in chart_data:
-            generated.append(generate_competitors_chart(chart_data['competitors'], output_dir, theme_config))
-        if 'trends' in chart_data:
-            generated.append(generate_trends_chart(chart_data['trends'], output_dir, theme_config))
-    except Exception as e:
-        print(f"[ChartGenerator] Error generating charts: {e}")
-    return generated
+    # Charts are independent: one bad dataset should not drop the others
+    results = await asyncio.gather(*(asyncio.wrap_future(f) for _, f in pending), return_exceptions=True)
+    rendered: List[Tuple[str, bytes]] = []
+    for (key, _), result in zip(pending, results):
+        if isinstance(result, BaseException):
+            print(f"[ChartGenerator] Error generating {key} chart: {result}")
+        else:
+            rendered.append(result)
+    return rendered
@@ -1,38 +1,86 @@
 import os
 from functools import lru_cache
-from typing import List
-from pydantic import BaseModel
+from typing import Any, Callable, List, Optional
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
-# Load .env file
+# .env is loaded by get_settings() at app startup, not on import
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
-load_dotenv(env_path)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def _env(name: str, default: Any, cast: Callable[[str], Any] = str):
+    """Field read from the environment when Settings is built, not when this module is imported."""
+    return Field(default_factory=lambda: cast(os.getenv(name, default)))
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
 
 
 class Settings(BaseModel):
     app_name: str = "AI Research Agent Backend"
-    environment: str = os.getenv("ENVIRONMENT", "development")
+    environment: str = _env("ENVIRONMENT", "development")
 
     # OpenAI API Key
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_api_key: str = _env("OPENAI_API_KEY", "")
 
     # CORS Setup
-    backend_host: str = os.getenv("BACKEND_HOST", "http://localhost:8000")
-    frontend_origin: str = os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
-    cors_allow_origins: List[str] = [
-        frontend_origin,
-        "http://127.0.0.1:3000",
-    ]
+    backend_host: str = _env("BACKEND_HOST", "http://localhost:8000")
+    outputs_url_prefix: str = ""  # derived from backend_host
+    frontend_origin: str = _env("FRONTEND_ORIGIN", "http://localhost:3000")
+    cors_allow_origins: List[str] = []  # derived from frontend_origin
+
+    # WebSocket transport (passed to Uvicorn by `python -m app.main`)
+    ws_max_size: int = _env("WS_MAX_SIZE", 16 * 1024 * 1024, int)
+    ws_max_queue: int = _env("WS_MAX_QUEUE", 64, int)
+
+    # On-disk cache of LLM responses (empty string disables it)
+    llm_cache_dir: str = _env("LLM_CACHE_DIR", "/tmp/ai-ppt-llmcache")
+
+    # On-disk cache of scraped page text (empty string disables it)
+    scrape_cache_dir: str = _env("SCRAPE_CACHE_DIR", "/tmp/ai-ppt-scrape")
+
+    # On-disk cache of finished pipeline results (empty string disables it).
+    # Only used when LLM_TEMPERATURE is set to 0, i.e. the agents are
+    # deterministic; unset, every call uses the model's default sampling.
+    result_cache_dir: str = _env("RESULT_CACHE_DIR", "/tmp/ai-ppt-results")
+    llm_temperature: Optional[float] = _env("LLM_TEMPERATURE", None, _optional_float)
+
+    # On-disk store of slide-plan section layouts reused across similar topics
+    # (empty string disables it)
+    plan_template_dir: str = _env("PLAN_TEMPLATE_DIR", "/tmp/ai-ppt-plan-templates")
+
+    # LLM rate limiting: at most this many calls in flight per process, and
+    # optionally requests/tokens per minute (0 disables; needs aiolimiter)
+    max_concurrent_llm_calls: int = _env("MAX_CONCURRENT_LLM_CALLS", 8, int)
+    llm_requests_per_minute: int = _env("LLM_REQUESTS_PER_MINUTE", 0, int)
+    llm_tokens_per_minute: int = _env("LLM_TOKENS_PER_MINUTE", 0, int)
+
+    # Worker processes shared by chart rendering and deck building (0 = one per CPU)
+    render_workers: int = _env("RENDER_WORKERS", 0, int)
+
+    # Ask the validation, chart and recommendation agents in one structured
+    # LLM call instead of three concurrent ones: fewer input tokens, but the
+    # single longer generation is usually slower than the parallel calls
+    composite_analysis: bool = _env("COMPOSITE_ANALYSIS", "false", lambda v: v.lower() in ("1", "true", "yes"))
 
     # Directory for saving PPTs
-    project_root: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    outputs_dir: str = os.path.join(project_root, "outputs")
+    project_root: str = PROJECT_ROOT
+    outputs_dir: str = os.path.join(PROJECT_ROOT, "outputs")
+
+    def model_post_init(self, __context: Any) -> None:
+        if not self.outputs_url_prefix:
+            self.outputs_url_prefix = f"{self.backend_host}/outputs/"
+        if not self.cors_allow_origins:
+            self.cors_allow_origins = [self.frontend_origin, "http://127.0.0.1:3000"]
 
 
-@lru_cache
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
+    load_dotenv(env_path)
     settings = Settings()
     if not settings.openai_api_key:
-        print("\n[ERROR] OPENAI_API_KEY missing in .env file!\n")
+        raise RuntimeError("OPENAI_API_KEY missing in .env file!")
     os.makedirs(settings.outputs_dir, exist_ok=True)
     return settings
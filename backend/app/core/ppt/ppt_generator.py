@@ -0,0 +1,492 @@
+import io
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from pptx import Presentation
+from pptx.util import Pt, Inches
+from pptx.dml.color import RGBColor
+from pptx.enum.text import PP_ALIGN
+from pptx.oxml.xmlchemy import OxmlElement
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.enum.shapes import MSO_SHAPE
+
+# Deck building runs in spawned worker processes, which import this module
+# (and whatever it imports) before every first task. It only depends on
+# python-pptx: no OpenAI clients, caches or settings.
+
+# -------------------------------------------------------------------
+# Utility: Slugify topic
+# -------------------------------------------------------------------
+_SLUG_NONALNUM = re.compile(r"[^a-z0-9]+")
+_SLUG_DASHES = re.compile(r"-+")
+
+def slugify(text: str) -> str:
+    text = text.strip().lower()
+    text = _SLUG_NONALNUM.sub("-", text)
+    text = _SLUG_DASHES.sub("-", text).strip("-")
+    return text or "report"
+
+# -------------------------------------------------------------------
+# PPT generator (Professional Dark Theme)
+# -------------------------------------------------------------------
+
+# Slide geometry and font sizes, computed once (python-pptx lengths are EMU ints)
+SLIDE_WIDTH = Inches(13.333)
+SLIDE_HEIGHT = Inches(7.5)
+
+# (left, top, width, height)
+TITLE_BOX = (Inches(1), Inches(2.5), Inches(11.33), Inches(2))
+SUBTITLE_BOX = (Inches(1), Inches(4.5), Inches(11.33), Inches(2))
+HEADING_BOX = (Inches(0.5), Inches(0.5), Inches(12), Inches(1))
+BULLET_CARD_BOX = (Inches(0.5), Inches(1.8), Inches(12), Inches(5))
+# Inset so the bullets sit inside the card
+BULLET_TEXT_BOX = (Inches(0.9), Inches(2.2), Inches(11.0), Inches(4.2))
+SOURCES_TEXT_BOX = (Inches(0.7), Inches(2.0), Inches(11.6), Inches(4.6))
+CHART_CARD_BOX = (Inches(0.6), Inches(1.4), SLIDE_WIDTH - Inches(1.2), SLIDE_HEIGHT - Inches(2.0))
+
+# Chart picture placement (safe margins)
+CHART_LEFT = Inches(0.85)
+CHART_TOP = Inches(1.55)
+CHART_MAX_WIDTH = SLIDE_WIDTH - Inches(1.7)
+CHART_MAX_HEIGHT = SLIDE_HEIGHT - Inches(2.2)
+
+PT48, PT36, PT24, PT22, PT14 = Pt(48), Pt(36), Pt(24), Pt(22), Pt(14)
+PT12, PT6, PT2 = Pt(12), Pt(6), Pt(2)
+
+_HEX_COLOR = re.compile(r"[0-9a-fA-F]{6}")
+
+
+def _hex_channels(hex_str: str) -> Tuple[int, int, int]:
+    """(r, g, b) of "#RRGGBB" or "#RGB"; anything else raises ValueError."""
+    digits = hex_str.lstrip('#')
+    if len(digits) == 3:
+        digits = "".join(ch * 2 for ch in digits)
+    if not _HEX_COLOR.fullmatch(digits):
+        raise ValueError(f"Not a hex color: {hex_str!r}")
+    v = int(digits, 16)
+    return (v >> 16) & 0xFF, (v >> 8) & 0xFF, v & 0xFF
+
+@lru_cache(maxsize=64)
+def hex_to_rgb(hex_str):
+    if not hex_str:
+        return RGBColor(0, 0, 0)
+    return RGBColor(*_hex_channels(hex_str))
+# -------------------------------
+# COLOR UTILITIES (ADD THESE)
+# -------------------------------
+@lru_cache(maxsize=64)
+def is_dark_color(hex_color: str) -> bool:
+    """Return True if a hex color is dark."""
+    r, g, b = _hex_channels(hex_color)
+    luminance = 0.2126*r + 0.7152*g + 0.0722*b
+    return luminance < 128
+
+def choose_text_color(bg_hex: str) -> RGBColor:
+    """Automatically selects black or white text depending on background color."""
+    return RGBColor(255, 255, 255) if is_dark_color(bg_hex) else RGBColor(20, 20, 20)    
+
+# Card behind bullets/charts: white on dark backgrounds, black on light ones
+_WHITE = RGBColor(255, 255, 255)
+_BLACK = RGBColor(0, 0, 0)
+
+
+@dataclass(slots=True, frozen=True)
+class ThemeCtx:
+    """Theme-derived colors and fonts, resolved once per deck."""
+    bg_rgb: RGBColor
+    bg_is_dark: bool
+    heading_rgb: RGBColor
+    subtext_rgb: RGBColor
+    text_rgb: RGBColor
+    font_family: str
+    radius: int
+    card_color: Optional[RGBColor]
+    card_transparency: float
+    gradient: bool
+
+    @classmethod
+    def from_config(cls, theme_config: Optional[Dict[str, Any]]) -> "ThemeCtx":
+        tc = theme_config or {}
+        bg_hex = tc.get("background_color", "#121212")
+        bg_is_dark = is_dark_color(bg_hex)
+        radius = tc.get("corner_radius", 40)
+
+        # No card when corners are disabled; bullets then sit on the background
+        card_color = (_WHITE if bg_is_dark else _BLACK) if radius > 0 else None
+
+        return cls(
+            bg_rgb=hex_to_rgb(bg_hex),
+            bg_is_dark=bg_is_dark,
+            heading_rgb=hex_to_rgb(tc.get("accent_color", "#38BDF8")),
+            subtext_rgb=hex_to_rgb(tc.get("subtext_color", "#B4B4B4")) if bg_is_dark else RGBColor(40, 40, 40),
+            # Dark bullets on a white card, light ones otherwise
+            text_rgb=RGBColor(30, 30, 30) if card_color == _WHITE else RGBColor(240, 240, 240),
+            font_family=tc.get("font_family", "Arial"),
+            radius=radius,
+            card_color=card_color,
+            card_transparency=0.20 if bg_is_dark else 0.40,
+            gradient=tc.get("theme") == "gradient",
+        )
+
+
+def _apply_theme(slide, ctx: ThemeCtx):
+    fill = slide.background.fill
+    fill.solid()
+    fill.fore_color.rgb = ctx.bg_rgb
+
+    # Gradient support (simple vertical gradient simulation if requested)
+    if ctx.gradient:
+        # python-pptx doesn't support gradients easily on background directly via high-level API
+        # So we stick to solid background or add a shape behind everything.
+        # For robustness, we will stick to solid background color[0] or background_color
+        pass
+
+def _add_rounded_rect_background(slide, left, top, width, height, ctx: ThemeCtx):
+    """Adds an auto-contrast rounded rectangle background behind text and returns both the shape and card color."""
+    if ctx.card_color is None:
+        return None, None
+
+    # Create shape
+    shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, width, height)
+
+    # Apply styling
+    shape.fill.solid()
+    shape.fill.fore_color.rgb = ctx.card_color
+    shape.fill.transparency = ctx.card_transparency
+
+    shape.line.fill.background()
+
+    # Rounded corner radius (0–1 range)
+    try:
+        shape.adjustments[0] = ctx.radius / 100.0
+    except:
+        pass
+
+    return shape, ctx.card_color
+
+
+
+def _add_title_slide(prs: Presentation, title: str, subtitle: str, ctx: ThemeCtx):
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    _apply_theme(slide, ctx)
+
+    font_family = ctx.font_family
+    title_color = ctx.heading_rgb
+    sub_color = ctx.heading_rgb
+
+    # Title
+    tx = slide.shapes.add_textbox(*TITLE_BOX)
+    tf = tx.text_frame
+    p = tf.paragraphs[0]
+    p.text = title
+    p.font.bold = True
+    p.font.size = PT48
+    p.font.color.rgb = title_color
+    p.font.name = font_family
+    p.alignment = PP_ALIGN.LEFT
+    
+    # Subtitle
+    tx2 = slide.shapes.add_textbox(*SUBTITLE_BOX)
+    tf2 = tx2.text_frame
+    p2 = tf2.paragraphs[0]
+    p2.text = subtitle
+    p2.font.size = PT24
+    p2.font.color.rgb = sub_color
+    p2.font.name = font_family
+    p2.alignment = PP_ALIGN.LEFT
+    return slide
+
+def _add_bullet_slide(prs: Presentation, heading: str, bullets: List[str], ctx: ThemeCtx):
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    _apply_theme(slide, ctx)
+
+    font_family = ctx.font_family
+    heading_color = ctx.heading_rgb
+
+    # --- Card behind bullets; bullet color contrasts with it ---
+    _add_rounded_rect_background(slide, *BULLET_CARD_BOX, ctx)
+    text_color = ctx.text_rgb
+
+    # Heading
+    tx = slide.shapes.add_textbox(*HEADING_BOX)
+    tf = tx.text_frame
+    p = tf.paragraphs[0]
+    p.text = heading
+    p.font.bold = True
+    p.font.size = PT36
+    p.font.color.rgb = heading_color
+    p.font.name = font_family
+
+    
+    # Bullets
+    txb = slide.shapes.add_textbox(*BULLET_TEXT_BOX)
+
+    tfb = txb.text_frame
+    tfb.word_wrap = True
+    tfb.clear()
+
+    if not bullets:
+        bullets = ["Insight coming soon", "More data required"]
+
+    _fast_append_bullets(tfb, [f"• {bullet}" for bullet in bullets], ctx)
+
+    return slide
+
+
+# Characters python-pptx rewrites on assignment (line breaks, XML-invalid controls)
+_SPECIAL_TEXT = re.compile(r"[\x00-\x08\x0a-\x1f]")
+
+
+@lru_cache(maxsize=8)
+def _bullet_ppr_xml(ctx: ThemeCtx) -> str:
+    """<a:pPr> shared by every bullet paragraph of a deck."""
+    return (
+        '<a:pPr><a:lnSpc><a:spcPct val="130000"/></a:lnSpc>'
+        f'<a:spcBef><a:spcPts val="{PT2.centipoints}"/></a:spcBef>'
+        f'<a:spcAft><a:spcPts val="{PT12.centipoints}"/></a:spcAft>'
+        f'<a:defRPr sz="{PT22.centipoints}"><a:solidFill><a:srgbClr val="{ctx.text_rgb}"/></a:solidFill>'
+        f'<a:latin typeface={quoteattr(ctx.font_family)}/></a:defRPr></a:pPr>'
+    )
+
+
+def _fast_append_bullets(text_frame, texts: List[str], ctx: ThemeCtx):
+    """
+    Append bullet paragraphs by parsing their XML in one go, instead of ~10
+    python-pptx setter calls per bullet. Produces the same XML as the
+    paragraph API; text it would rewrite (line breaks, control characters)
+    takes the API path.
+    """
+    if any(_SPECIAL_TEXT.search(text) for text in texts):
+        for text in texts:
+            para = text_frame.add_paragraph()
+            para.text = text
+            para.font.size = PT22
+            para.font.color.rgb = ctx.text_rgb
+            para.font.name = ctx.font_family
+            para.space_after = PT12
+            para.space_before = PT2
+            para.line_spacing = 1.3
+        return
+
+    ppr = _bullet_ppr_xml(ctx)
+    paragraphs = "".join(f"<a:p>{ppr}<a:r><a:t>{escape(text)}</a:t></a:r></a:p>" for text in texts)
+    wrapper = parse_xml(f"<a:txBody {nsdecls('a')}>{paragraphs}</a:txBody>")
+    text_frame._txBody.extend(list(wrapper))
+
+
+def _add_sources_slide(prs: Presentation, sources: List[str], ctx: ThemeCtx):
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    _apply_theme(slide, ctx)
+
+    font_family = ctx.font_family
+    heading_color = ctx.heading_rgb
+    subtext_color = ctx.subtext_rgb
+
+
+    # ----------------------------------------------------
+    # Heading
+    # ----------------------------------------------------
+    tx = slide.shapes.add_textbox(*HEADING_BOX)
+    tf = tx.text_frame
+    p = tf.paragraphs[0]
+    p.text = "Sources"
+    p.font.bold = True
+    p.font.size = PT36
+    p.font.color.rgb = heading_color
+    p.font.name = font_family
+
+    
+
+    # ----------------------------------------------------
+    # Source list text
+    # ----------------------------------------------------
+    txb = slide.shapes.add_textbox(*SOURCES_TEXT_BOX)
+    tfb = txb.text_frame
+    tfb.word_wrap = True
+    
+    for s in sources[:8]:
+        text = s.get("title") or s.get("url") or str(s)
+        para = tfb.add_paragraph()
+        para.text = text
+        para.font.size = PT14
+        para.font.color.rgb = subtext_color
+        para.font.name = font_family
+        para.space_after = PT6
+
+    return slide
+
+
+def _add_chart_slide(prs: Presentation, chart_path: str, ctx: ThemeCtx, png: bytes):
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    _apply_theme(slide, ctx)
+
+    font_family = ctx.font_family
+    heading_color = ctx.heading_rgb
+
+    # Title from filename
+    title = os.path.basename(chart_path)\
+                .replace("chart_", "")\
+                .replace(".png", "")\
+                .replace("_", " ")\
+                .title()
+
+    # Title text
+    tx = slide.shapes.add_textbox(*HEADING_BOX)
+    tf = tx.text_frame
+    p = tf.paragraphs[0]
+    p.text = title
+    p.font.bold = True
+    p.font.size = PT36
+    p.font.color.rgb = heading_color
+    p.font.name = font_family
+
+    # ---------- Optional card behind chart ----------
+    # Optional card behind chart
+    card_shape, card_color = _add_rounded_rect_background(slide, *CHART_CARD_BOX, ctx)
+
+    # Send card backwards so chart stays visible
+    if card_shape:
+        card_shape.z_order = 1
+
+
+    # ---------- Chart placement (safe margins) ----------
+    left = CHART_LEFT
+    top = CHART_TOP
+    max_width = CHART_MAX_WIDTH
+    max_height = CHART_MAX_HEIGHT
+
+    pic = slide.shapes.add_picture(io.BytesIO(png), left, top)
+
+    # -------- AUTO SCALE TO FIT --------
+    # Scale width first
+    if pic.width > max_width:
+        scale = max_width / pic.width
+        pic.width = int(pic.width * scale)
+        pic.height = int(pic.height * scale)
+
+    # Scale height if needed
+    if pic.height > max_height:
+        scale = max_height / pic.height
+        pic.height = int(pic.height * scale)
+        pic.width = int(pic.width * scale)
+
+    # -------- CENTER CHART HORIZONTALLY --------
+    pic.left = int((prs.slide_width - pic.width) / 2)
+
+    return slide
+
+
+
+
+# -------------------------------------------------------------------
+# Animation helpers (unchanged from previous implementation)
+# -------------------------------------------------------------------
+def apply_slide_transition(slide):
+    transition = OxmlElement("p:transition")
+    transition.set("spd", "slow")
+    fade = OxmlElement("p:fade")
+    transition.append(fade)
+    slide_element = slide.element
+    insert_idx = 0
+    cSld = slide_element.find(qn("p:cSld"))
+    if cSld is not None:
+        insert_idx = slide_element.index(cSld) + 1
+    clrMapOvr = slide_element.find(qn("p:clrMapOvr"))
+    if clrMapOvr is not None:
+        insert_idx = slide_element.index(clrMapOvr) + 1
+    slide_element.insert(insert_idx, transition)
+
+# -------------------------------------------------------------------
+# Bullet Animations (placeholder)
+# -------------------------------------------------------------------
+def apply_bullet_animations(slide):
+    # (Implementation omitted for brevity – reuse previous logic)
+    pass
+
+
+# -------------------------------------------------------------------
+# PPT generation with chart integration
+# -------------------------------------------------------------------
+# Deck building is CPU-bound python-pptx work, so the pipeline runs it in
+# the chart render pool's worker processes: concurrent requests build their
+# decks on separate cores without holding the event loop's GIL. Charts are
+# rendered before a deck is submitted, so a deck never waits on the pool.
+
+
+def generate_ppt(topic: str, slide_plan: Dict[str, Any], output_dir: str, theme_config: Dict[str, Any] = None,
+                 chart_images: Optional[List[Tuple[str, bytes]]] = None) -> (str, str):
+    """
+    Build and save the deck. chart_images are the in-memory (path, PNG
+    bytes) pairs of render_charts, embedded without touching the disk.
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+    import os
+    from datetime import datetime
+
+    prs = Presentation()
+    prs.slide_width = SLIDE_WIDTH
+    prs.slide_height = SLIDE_HEIGHT
+
+    title = slide_plan.get("title", topic)
+    subtitle = slide_plan.get("subtitle", "Auto-generated AI research deck")
+    sections = slide_plan.get("sections", [])
+    conclusion_bullets = slide_plan.get("conclusion_bullets", [])
+    sources = slide_plan.get("sources_used", [])
+    
+    # Use theme config from slide plan if not provided explicitly (fallback)
+    if not theme_config:
+        theme_config = slide_plan.get("theme_config", {})
+    ctx = ThemeCtx.from_config(theme_config)
+
+    # --------------------- Title Slide ---------------------
+    slide = _add_title_slide(prs, title, subtitle, ctx)
+    apply_slide_transition(slide)
+
+    # --------------------- Content Sections ---------------------
+    for sec in sections:
+        slide = _add_bullet_slide(
+            prs,
+            sec.get("heading", "Section"),
+            sec.get("bullets", []),
+            ctx
+        )
+        apply_bullet_animations(slide)
+        apply_slide_transition(slide)
+
+    # --------------------- Conclusion -----------------------
+    if conclusion_bullets:
+        slide = _add_bullet_slide(prs, "Key Takeaways", conclusion_bullets, ctx)
+        apply_bullet_animations(slide)
+        apply_slide_transition(slide)
+
+    # --------------------- Sources --------------------------
+    if sources:
+        slide = _add_sources_slide(prs, sources, ctx)
+        apply_slide_transition(slide)
+
+    # --------------------- Charts ---------------------------
+    for cp, png in chart_images or []:
+        try:
+            slide = _add_chart_slide(prs, cp, ctx, png)
+            apply_slide_transition(slide)
+        except Exception as e:
+            print(f"[ChartGenerator] Error: {e}")
+
+    # --------------------- Save PPT -------------------------
+    slug = slugify(topic)
+    ts = datetime.now().strftime("%Y%m%d_%H%M")
+    filename = f"{slug}_{ts}.pptx"
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, filename)
+
+    prs.save(output_path)
+
+    return filename, output_path
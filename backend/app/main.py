@@ -1,14 +1,44 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from app.api import api_router
 from app.core import get_settings
 
-settings = get_settings()
+
+def configure_logging(level: int = logging.INFO):
+    """
+    Route all records through a QueueHandler; a QueueListener thread does the
+    actual stream writes, so logging never blocks the event loop on stdio.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, QueueHandler) for h in root.handlers):
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
 
 
 def create_app() -> FastAPI:
+    # Imported here so spawned workers re-importing this module don't load the pipeline
+    from app.api import api_router
+
+    configure_logging()
+
+    # Load and validate configuration before any worker accepts requests
+    settings = get_settings()
+
     app = FastAPI(
         title=settings.app_name,
         description="Backend for AI Research Agent (FastAPI + OpenAI)",
@@ -24,17 +54,26 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
-    # Routes
+    # Routes (generated PPTs are served by the /outputs/{filename} route)
     app.include_router(api_router)
 
-    # Static files for PPTs
-    app.mount(
-        "/outputs",
-        StaticFiles(directory=settings.outputs_dir),
-        name="outputs",
-    )
-
     return app
 
 
-app = create_app()
+# Spawned worker processes (chart rendering, deck building) re-import the
+# launching module as __mp_main__; they must not build a second app
+if __name__ != "__mp_main__":
+    app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    settings = get_settings()
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        ws_max_size=settings.ws_max_size,
+        ws_max_queue=settings.ws_max_queue,
+    )
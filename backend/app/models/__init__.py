@@ -1,4 +1,8 @@
 from .request_models import GenerateRequest
-from .response_models import GenerateResponse
+from .response_models import GenerateResponse, TaskSubmitResponse, TaskStatusResponse
+from .agent_models import ValidationResult, ChartPlan, Recommendations, CompositeAnalysis
 
-__all__ = ["GenerateRequest", "GenerateResponse"]
+__all__ = [
+    "GenerateRequest", "GenerateResponse", "TaskSubmitResponse", "TaskStatusResponse",
+    "ValidationResult", "ChartPlan", "Recommendations", "CompositeAnalysis",
+]
@@ -0,0 +1,77 @@
+import re
+from typing import Annotated, Any, Dict, List, Literal
+
+from pydantic import BaseModel, BeforeValidator, Field
+
+
+def _as_list(value: Any) -> Any:
+    """A lone string where a list is expected becomes a one-item list."""
+    return [value] if isinstance(value, str) else value
+
+
+def _lower(value: Any) -> Any:
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+_NUMBER_DECORATION = re.compile(r"[%$€£,\s]")
+
+
+def _as_number(value: Any) -> Any:
+    """A number, or a numeric string such as "12%" or "$1,200"; None otherwise."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(_NUMBER_DECORATION.sub("", value))
+        except ValueError:
+            return None
+    return None
+
+
+def _clean_chart_data(value: Any) -> Any:
+    """Drop values that aren't numbers, and series left empty, instead of rejecting every chart."""
+    if not isinstance(value, dict):
+        return value
+    cleaned = {}
+    for name, series in value.items():
+        if not isinstance(series, dict):
+            continue
+        points = {label: _as_number(v) for label, v in series.items()}
+        points = {label: v for label, v in points.items() if v is not None}
+        if points:
+            cleaned[name] = points
+    return cleaned
+
+
+# Schemas of the analysis agents' LLM responses. Pydantic builds each model's
+# validator when the class is defined, so parsing a response is a single
+# compiled JSON parse + validate (model_validate_json) per call.
+StringList = Annotated[List[str], BeforeValidator(_as_list)]
+ChartSeries = Dict[str, float]
+ChartData = Annotated[Dict[str, ChartSeries], BeforeValidator(_clean_chart_data)]
+
+
+class ValidationResult(BaseModel):
+    validated_summary: str = ""
+    validated_key_points: StringList = Field(default_factory=list)
+    caveats: StringList = Field(default_factory=list)
+    confidence: Annotated[Literal["high", "medium", "low"], BeforeValidator(_lower)] = "medium"
+    things_to_double_check: StringList = Field(default_factory=list)
+
+
+class ChartPlan(BaseModel):
+    chart_data: ChartData = Field(default_factory=dict)
+
+
+class Recommendations(BaseModel):
+    key_recommendations: StringList = Field(default_factory=list)
+    action_plan: StringList = Field(default_factory=list)
+    summary_recommendations: StringList = Field(default_factory=list)
+
+
+class CompositeAnalysis(BaseModel):
+    validation: ValidationResult
+    chart_data: ChartData = Field(default_factory=dict)
+    recommendations: Recommendations
@@ -8,3 +8,17 @@ class GenerateResponse(BaseModel):
     ppt_url: str = Field(..., description="URL where the PPT can be downloaded")
     summary: Optional[str] = Field(None, description="Short summary of the research")
     key_points: Optional[List[str]] = Field(default=None, description="Key bullet points")
+
+
+class TaskSubmitResponse(BaseModel):
+    task_id: str = Field(..., description="ID of the background pipeline task")
+    status: str = Field(..., description="Initial task status")
+
+
+class TaskStatusResponse(BaseModel):
+    task_id: str = Field(..., description="ID of the background pipeline task")
+    status: str = Field(..., description="queued, running, done or error")
+    topic: str = Field(..., description="The topic being researched")
+    message: Optional[str] = Field(None, description="Latest progress or error message")
+    ppt_filename: Optional[str] = Field(None, description="Filename of the generated PPT, once done")
+    ppt_url: Optional[str] = Field(None, description="URL where the PPT can be downloaded, once done")
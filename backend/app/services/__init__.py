@@ -1,4 +1,5 @@
-from .pipeline import run_research_pipeline, run_research_pipeline_stream
+from .pipeline import LLMUnavailableError, run_research_pipeline, run_research_pipeline_stream
+from .jobs import submit_job, get_job
 
 
-__all__ = ["run_research_pipeline"]
+__all__ = ["LLMUnavailableError", "run_research_pipeline", "run_research_pipeline_stream", "submit_job", "get_job"]
@@ -0,0 +1,433 @@
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+import orjson
+
+from app.core import get_settings
+
+# Optional helper (used if installed)
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+settings = get_settings()
+
+# -------------------------------------------------------------------
+# Exact-match LLM response cache
+# -------------------------------------------------------------------
+# Keyed by sha256(model + prompt [+ response format]): re-running the pipeline on the same
+# research hits the disk (~1 ms) instead of the API (~2 s per call).
+LLM_CACHE_TTL = 7 * 86400
+
+LLM_CACHE = (
+    diskcache.Cache(settings.llm_cache_dir, size_limit=2**30)
+    if diskcache and settings.llm_cache_dir
+    else None
+)
+
+
+def llm_cache_key(model: str, prompt: str, text_format: Optional[Mapping[str, Any]] = None) -> str:
+    key = f"{model}\0{prompt}"
+    if text_format:
+        # Only part of the key when set, so plain-JSON calls keep their entries
+        key += f"\0{canonical_json(text_format)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def cached_call(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Cache an LLM helper with a (prompt, model=...) signature. The first
+    parameter is the cached input, whatever it is named; a text_format
+    parameter, if the helper has one, is part of the key. Works for sync and
+    async helpers. Only successful responses are stored; without diskcache
+    the helper is called directly.
+    """
+    signature = inspect.signature(fn)
+    input_param = next(iter(signature.parameters))
+
+    def cache_key(args, kwargs) -> str:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return llm_cache_key(bound.arguments["model"], bound.arguments[input_param], bound.arguments.get("text_format"))
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if LLM_CACHE is None:
+                return await fn(*args, **kwargs)
+
+            # diskcache is blocking sqlite I/O; keep it off the event loop
+            key = cache_key(args, kwargs)
+            result = await asyncio.to_thread(LLM_CACHE.get, key)
+            if result is None:
+                result = await fn(*args, **kwargs)
+                await asyncio.to_thread(LLM_CACHE.set, key, result, expire=LLM_CACHE_TTL)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if LLM_CACHE is None:
+            return fn(*args, **kwargs)
+
+        key = cache_key(args, kwargs)
+        result = LLM_CACHE.get(key)
+        if result is None:
+            result = fn(*args, **kwargs)
+            LLM_CACHE.set(key, result, expire=LLM_CACHE_TTL)
+        return result
+
+    return wrapper
+
+
+# -------------------------------------------------------------------
+# Scraped page cache
+# -------------------------------------------------------------------
+# Extracted page text keyed by sha256(url), so re-running a topic does not
+# re-fetch and re-parse the same articles.
+SCRAPE_CACHE_TTL = 86400
+
+SCRAPE_CACHE = (
+    diskcache.Cache(settings.scrape_cache_dir, size_limit=2**30)
+    if diskcache and settings.scrape_cache_dir
+    else None
+)
+
+
+def scrape_cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def get_scraped(url: str) -> Optional[str]:
+    if SCRAPE_CACHE is None:
+        return None
+    return SCRAPE_CACHE.get(scrape_cache_key(url))
+
+
+def set_scraped(url: str, text: str):
+    """Store the full extracted text; empty results are not cached."""
+    if SCRAPE_CACHE is not None and text:
+        SCRAPE_CACHE.set(scrape_cache_key(url), text, expire=SCRAPE_CACHE_TTL)
+
+
+# -------------------------------------------------------------------
+# Semantic cache for the research agents
+# -------------------------------------------------------------------
+# The validate / charts / recs agents all read the same research dict. A
+# re-run whose research differs by a bullet or two is answered from the
+# closest previous payload (cosine >= threshold) instead of a new LLM call.
+SEMANTIC_THRESHOLD = 0.93
+
+# Entries kept per (namespace, topic) index; oldest are evicted first
+SEMANTIC_MAX_ENTRIES = 256
+
+# (namespace, topic) indexes kept in memory; least recently used are evicted
+SEMANTIC_MAX_TOPICS = 1024
+
+
+class SemanticIndex:
+    """Top-1 cosine lookup over unit-normalised embeddings."""
+
+    def __init__(self, max_entries: int = SEMANTIC_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+
+    def lookup(self, vector: np.ndarray, threshold: float) -> Optional[Any]:
+        if self._vectors is None:
+            return None
+        scores = self._vectors @ vector
+        best = int(scores.argmax())
+        return self._values[best] if scores[best] >= threshold else None
+
+    def add(self, vector: np.ndarray, value: Any):
+        row = vector[np.newaxis, :]
+        if self._vectors is None:
+            self._vectors = row
+        else:
+            self._vectors = np.vstack([self._vectors, row])[-self.max_entries:]
+        self._values = (self._values + [value])[-self.max_entries:]
+
+
+class _IndexLRU:
+    """SemanticIndex per key, created on first use; only the max_keys most recently used are kept."""
+
+    def __init__(self, max_keys: int = SEMANTIC_MAX_TOPICS):
+        self.max_keys = max_keys
+        self._indexes: "OrderedDict[tuple, SemanticIndex]" = OrderedDict()
+
+    def __getitem__(self, key: tuple) -> SemanticIndex:
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            return index
+        index = self._indexes[key] = SemanticIndex()
+        if len(self._indexes) > self.max_keys:
+            self._indexes.popitem(last=False)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+
+_SEMANTIC_INDEXES = _IndexLRU()
+
+
+def _materialise(obj: Any) -> Any:
+    """orjson fallback: layered mappings (ChainMap) are flattened only when serialised."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def canonical_json(research: Mapping[str, Any]) -> str:
+    """Compact, key-sorted JSON: the one serialisation shared by the agents and the cache."""
+    return orjson.dumps(research, default=_materialise, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def semantic_cached(
+    namespace: str,
+    embed: Callable[[str], Awaitable[List[float]]],
+    threshold: float = SEMANTIC_THRESHOLD,
+):
+    """
+    Cache an async agent taking a research dict. The canonical research JSON
+    is embedded with the async `embed` (a precomputed `research_json=` kwarg
+    is reused, and a `research_embedding=` kwarg, which is not passed on to
+    the agent, replaces the embedding call); lookups are scoped to
+    (namespace, topic) so a similar payload for another topic never reuses
+    its output. If embedding fails the agent is called uncached.
+    """
+    def decorator(fn: Callable[..., Awaitable[Dict[str, Any]]]):
+        @functools.wraps(fn)
+        async def wrapper(research: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+            embedding = kwargs.pop("research_embedding", None)
+            canonical = kwargs.get("research_json") or canonical_json(research)
+            try:
+                vector = _unit(embedding if embedding is not None else await embed(canonical))
+            except Exception as e:
+                print(f"⚠️ Semantic cache embedding failed ({namespace}): {e}")
+                return await fn(research, *args, **kwargs)
+
+            topic = str(research.get("topic", "")).strip().lower()
+            index = _SEMANTIC_INDEXES[(namespace, topic)]
+            hit = index.lookup(vector, threshold)
+            if hit is not None:
+                # Callers may mutate agent output; keep the cached copy intact
+                return copy.deepcopy(hit)
+
+            result = await fn(research, *args, **kwargs)
+            index.add(vector, copy.deepcopy(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# -------------------------------------------------------------------
+# Pipeline result cache
+# -------------------------------------------------------------------
+# Final results keyed by (topic, max_sources, theme_config), so an identical
+# request skips every LLM call and the PPT build.
+RESULT_CACHE_TTL = 86400
+
+# Stage outputs of unfinished runs, kept so a retry resumes where it failed
+CHECKPOINT_TTL = 6 * 3600
+
+
+# Paraphrased topics ("AI in healthcare" / "artificial intelligence in
+# medicine") with the same max_sources and theme reuse a result when their
+# embeddings are this close (cosine distance < 0.1)
+TOPIC_SIMILARITY_THRESHOLD = 0.90
+
+
+def result_cache_key(topic: str, max_sources: int, theme_config: Optional[Dict[str, Any]]) -> str:
+    payload = {"topic": topic.strip().lower(), "max_sources": max_sources, "theme": theme_config or {}}
+    return hashlib.sha256(canonical_json(payload).encode()).hexdigest()
+
+
+def result_scope(max_sources: int, theme_config: Optional[Dict[str, Any]]) -> str:
+    """Everything but the topic: results are only shared between topics within one scope."""
+    payload = {"max_sources": max_sources, "theme": theme_config or {}}
+    return hashlib.sha256(canonical_json(payload).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Async access to a diskcache store of pipeline results, with hit/miss
+    counters. Alongside the exact keys, a per-scope SemanticIndex of topic
+    embeddings (persisted in the same store) finds results for paraphrased
+    topics.
+    """
+
+    def __init__(self, directory: str):
+        self._cache = diskcache.Cache(directory, size_limit=2**28) if diskcache and directory else None
+        self._topic_indexes: Dict[str, SemanticIndex] = {}
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._cache is None:
+            return None
+        value = await asyncio.to_thread(self._cache.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int = RESULT_CACHE_TTL):
+        if self._cache is not None:
+            await asyncio.to_thread(self._cache.set, key, value, expire=ttl)
+
+    def _topic_index(self, scope: str) -> SemanticIndex:
+        index = self._topic_indexes.get(scope)
+        if index is None:
+            index = self._cache.get(f"topic-index:{scope}") or SemanticIndex()
+            self._topic_indexes[scope] = index
+        return index
+
+    async def get_similar(self, embedding: List[float], scope: str,
+                          threshold: float = TOPIC_SIMILARITY_THRESHOLD) -> Optional[Dict[str, Any]]:
+        """Result of the closest earlier topic in this scope, if similar enough."""
+        if self._cache is None:
+            return None
+        index = await asyncio.to_thread(self._topic_index, scope)
+        key = index.lookup(_unit(embedding), threshold)
+        if key is None:
+            return None
+        value = await asyncio.to_thread(self._cache.get, key)
+        if value is not None:
+            self.semantic_hits += 1
+        return value
+
+    async def add_topic(self, embedding: List[float], scope: str, key: str):
+        if self._cache is None:
+            return
+        index = await asyncio.to_thread(self._topic_index, scope)
+        index.add(_unit(embedding), key)
+        await asyncio.to_thread(self._cache.set, f"topic-index:{scope}", index)
+
+    async def get_checkpoints(self, run_key: str) -> Dict[str, Any]:
+        """Stage outputs saved by an earlier, unfinished run with this key."""
+        if self._cache is None:
+            return {}
+        return await asyncio.to_thread(self._cache.get, f"checkpoint:{run_key}", {})
+
+    def _save_checkpoint(self, run_key: str, stage: str, value: Any, ttl: int):
+        key = f"checkpoint:{run_key}"
+        with self._cache.transact():
+            saved = self._cache.get(key, {})
+            saved[stage] = value
+            self._cache.set(key, saved, expire=ttl)
+
+    async def set_checkpoint(self, run_key: str, stage: str, value: Any, ttl: int = CHECKPOINT_TTL):
+        if self._cache is not None:
+            await asyncio.to_thread(self._save_checkpoint, run_key, stage, value, ttl)
+
+    def _drop_checkpoints(self, run_key: str, stages: List[str]):
+        key = f"checkpoint:{run_key}"
+        with self._cache.transact():
+            saved = self._cache.get(key)
+            if saved is None:
+                return
+            for stage in stages:
+                saved.pop(stage, None)
+            self._cache.set(key, saved, expire=CHECKPOINT_TTL)
+
+    async def drop_checkpoints(self, run_key: str, stages: List[str]):
+        """Forget these stages' saved outputs, so the next attempt recomputes them."""
+        if self._cache is not None and stages:
+            await asyncio.to_thread(self._drop_checkpoints, run_key, stages)
+
+    async def clear_checkpoints(self, run_key: str):
+        if self._cache is not None:
+            await asyncio.to_thread(self._cache.delete, f"checkpoint:{run_key}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "semantic_hits": self.semantic_hits}
+
+
+RESULT_CACHE = ResultCache(settings.result_cache_dir)
+
+
+# -------------------------------------------------------------------
+# Slide-plan templates
+# -------------------------------------------------------------------
+# Topics of one family ("EV market analysis" / "solar market analysis") get
+# the same section layout from the slide-plan agent. The layout is stored per
+# theme and looked up by topic embedding; a topic joins the family of the
+# closest stored topic when their cosine similarity reaches this threshold.
+PLAN_FAMILY_THRESHOLD = 0.80
+
+# Plans with fewer sections (e.g. the fallback plan) are not stored as templates
+PLAN_TEMPLATE_MIN_SECTIONS = 5
+
+
+def theme_hash(theme_config: Optional[Dict[str, Any]]) -> str:
+    return hashlib.sha256(canonical_json(theme_config or {}).encode()).hexdigest()
+
+
+class PlanTemplateStore:
+    """
+    Section layouts of earlier slide plans, one SemanticIndex of topic
+    embeddings per theme, persisted in a diskcache store.
+    """
+
+    def __init__(self, directory: str):
+        self._cache = diskcache.Cache(directory, size_limit=2**24) if diskcache and directory else None
+        self._indexes: Dict[str, SemanticIndex] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self, theme: str) -> SemanticIndex:
+        index = self._indexes.get(theme)
+        if index is None:
+            index = self._cache.get(f"plan-templates:{theme}") or SemanticIndex()
+            self._indexes[theme] = index
+        return index
+
+    async def get(self, embedding: List[float], theme_config: Optional[Dict[str, Any]],
+                  threshold: float = PLAN_FAMILY_THRESHOLD) -> Optional[Dict[str, Any]]:
+        if self._cache is None:
+            return None
+        index = await asyncio.to_thread(self._index, theme_hash(theme_config))
+        template = index.lookup(_unit(embedding), threshold)
+        if template is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return template
+
+    async def add(self, embedding: List[float], theme_config: Optional[Dict[str, Any]], plan: Dict[str, Any]):
+        """Store the section layout of a freshly generated plan."""
+        headings = [s["heading"] for s in plan.get("sections", []) if s.get("heading")]
+        if self._cache is None or len(headings) < PLAN_TEMPLATE_MIN_SECTIONS:
+            return
+        theme = theme_hash(theme_config)
+        index = await asyncio.to_thread(self._index, theme)
+        index.add(_unit(embedding), {"headings": headings})
+        await asyncio.to_thread(self._cache.set, f"plan-templates:{theme}", index)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+PLAN_TEMPLATES = PlanTemplateStore(settings.plan_template_dir)
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+
+class EventLog:
+    """
+    Events of one pipeline run, shared by any number of followers: every
+    event is recorded, so late followers replay the run so far, then get
+    live events until the log is closed.
+    """
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, event: Dict[str, Any]):
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def close(self):
+        self.closed = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        self._subscribers.clear()
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every event so far, then live events until the log is closed."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        if self.closed:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
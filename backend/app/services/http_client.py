@@ -0,0 +1,23 @@
+import httpx
+
+# Optional helper (used if installed)
+try:
+    import h2  # enables HTTP/2 in httpx
+except ImportError:
+    h2 = None
+
+# -------------------------------------------------------------------
+# Shared outbound HTTP client
+# -------------------------------------------------------------------
+# One connection pool for page fetches and the async OpenAI client, so
+# concurrent stages reuse warm TCP/TLS connections instead of handshaking
+# per call. HTTP/2 multiplexes requests to one host over a single connection,
+# and gzip/brotli bodies are decoded transparently.
+HTTP_TIMEOUT = 60.0
+
+HTTP_CLIENT = httpx.AsyncClient(
+    http2=h2 is not None,
+    timeout=HTTP_TIMEOUT,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60),
+)
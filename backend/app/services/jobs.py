@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from .events import EventLog
+from .pipeline import run_research_pipeline_stream
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------
+# Background pipeline jobs
+# -------------------------------------------------------------------
+# POST /generate/tasks submits a job and returns immediately; the pipeline
+# runs as a background task on the event loop. Every event is recorded so
+# the progress WebSocket can replay and then follow a job by task_id.
+
+# Finished jobs are kept this long so clients can still fetch the result
+JOB_TTL_SECONDS = 60 * 60
+
+
+class Job(EventLog):
+    def __init__(self, topic: str):
+        super().__init__()
+        self.task_id = uuid.uuid4().hex
+        self.topic = topic
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+        self.close()
+
+
+_JOBS: Dict[str, Job] = {}
+
+
+async def _run_job(job: Job, max_sources: int, theme_config: Optional[Dict[str, Any]]):
+    job.status = "running"
+    try:
+        async for event in run_research_pipeline_stream(job.topic, max_sources, theme_config):
+            job.publish(event)
+            if event.get("status") == "DONE":
+                job.result = event
+            elif event.get("status") == "error":
+                job.status = "error"
+    except Exception as e:
+        logger.exception("Pipeline crashed for task %s", job.task_id)
+        job.status = "error"
+        job.publish({"status": "error", "message": str(e)})
+    finally:
+        if job.status != "error":
+            job.status = "done" if job.result else "error"
+        job.finish()
+
+
+def _prune_finished_jobs():
+    cutoff = time.monotonic() - JOB_TTL_SECONDS
+    for task_id in [tid for tid, job in _JOBS.items() if job.done and job.finished_at < cutoff]:
+        del _JOBS[task_id]
+
+
+def submit_job(topic: str, max_sources: int = 8, theme_config: Dict[str, Any] = None) -> Job:
+    """Start the pipeline in the background and return its Job handle."""
+    _prune_finished_jobs()
+    job = Job(topic)
+    _JOBS[job.task_id] = job
+    job.task = asyncio.create_task(_run_job(job, max_sources, theme_config))
+    return job
+
+
+def get_job(task_id: str) -> Optional[Job]:
+    return _JOBS.get(task_id)
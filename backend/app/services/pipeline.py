@@ -1,24 +1,44 @@
+import functools
+import inspect
 import os
+import random
 import re
-from datetime import datetime
-from typing import List, Dict, Any, Optional
-
+import shutil
+import threading
+import time
+from collections import ChainMap, defaultdict
+from collections.abc import Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from html import unescape
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import cached_property
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+import openai
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from bs4 import BeautifulSoup
-from openai import OpenAI
-from pptx import Presentation
-from pptx.util import Pt, Inches
-from pptx.dml.color import RGBColor
-from pptx.enum.text import PP_ALIGN
-from pptx.oxml.xmlchemy import OxmlElement
-from pptx.oxml.ns import qn
-from pptx.enum.shapes import MSO_SHAPE
+from openai import AsyncOpenAI, OpenAI
 
 from app.core import get_settings
-from app.core.charts.chart_generator import generate_charts
+from app.models import ChartPlan, CompositeAnalysis, Recommendations, ValidationResult
+from app.core.charts.chart_generator import render_charts, render_pool
+from app.core.ppt.ppt_generator import generate_ppt, slugify
+from .events import EventLog
+from .http_client import HTTP_CLIENT
+from .cache import (
+    LLM_CACHE, LLM_CACHE_TTL, PLAN_TEMPLATES, RESULT_CACHE, cached_call, canonical_json, get_scraped, llm_cache_key,
+    result_cache_key, result_scope, semantic_cached, set_scraped,
+)
 import asyncio
 
-import json
+import orjson
 
 # Optional helpers (used if installed)
 try:
@@ -26,6 +46,21 @@ try:
 except ImportError:
     trafilatura = None
 
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    from datasketch import MinHash, MinHashLSH
+except ImportError:
+    MinHash = MinHashLSH = None
+
+try:
+    from aiolimiter import AsyncLimiter
+except ImportError:
+    AsyncLimiter = None
+
 try:
     import wikipediaapi
 except ImportError:
@@ -37,37 +72,111 @@ except ImportError:
     YouTubeTranscriptApi = None
 
 settings = get_settings()
-client = OpenAI(api_key=settings.openai_api_key)
-
-# -------------------------------------------------------------------
-# Utility: Slugify topic
-# -------------------------------------------------------------------
-def _slugify(text: str) -> str:
-    text = text.strip().lower()
-    text = re.sub(r"[^a-z0-9]+", "-", text)
-    text = re.sub(r"-+", "-", text).strip("-")
-    return text or "report"
+# Retries are handled by `resilient` (below), not by the SDK
+client = OpenAI(api_key=settings.openai_api_key, max_retries=0)
+aclient = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0, http_client=HTTP_CLIENT)
 
 # -------------------------------------------------------------------
 # HTTP config
 # -------------------------------------------------------------------
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; AI-Research-Agent/1.0; +https://example.com)"}
 
+# Shared keep-alive session: repeat requests to DDG/YouTube/Wikipedia reuse
+# pooled TCP+TLS connections instead of handshaking on every call.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# Page fetches go through the shared HTTP_CLIENT with the scraper's headers
+FETCH_TIMEOUT = 30.0
+
+# Scrape politeness: cap requests in flight overall and per host, and back
+# off on 429/503 or connection errors instead of hammering a rate limit
+FETCH_CONCURRENCY = 64
+FETCH_PER_HOST = 8
+FETCH_ATTEMPTS = 3
+MAX_RETRY_AFTER = 30.0
+
+_FETCH_SEM = asyncio.Semaphore(FETCH_CONCURRENCY)
+_HOST_SEMS: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(FETCH_PER_HOST))
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (delay or HTTP date), capped at MAX_RETRY_AFTER."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+async def _get_with_backoff(url: str) -> httpx.Response:
+    host = urlparse(url).netloc
+    async with _FETCH_SEM, _HOST_SEMS[host]:
+        for attempt in range(FETCH_ATTEMPTS):
+            last_attempt = attempt == FETCH_ATTEMPTS - 1
+            try:
+                resp = await HTTP_CLIENT.get(url, headers=HEADERS, timeout=FETCH_TIMEOUT)
+            except (httpx.TimeoutException, httpx.ConnectError):
+                if last_attempt:
+                    raise
+                await asyncio.sleep(2 ** attempt + random.random())
+                continue
+
+            if resp.status_code in (429, 503) and not last_attempt:
+                delay = _retry_after(resp)
+                await asyncio.sleep(2 ** attempt + random.random() if delay is None else delay)
+                continue
+
+            resp.raise_for_status()
+            return resp
+
 # -------------------------------------------------------------------
 # 1) SEARCH LAYER — Hybrid, multi-source
 # -------------------------------------------------------------------
+# DuckDuckGo result anchors: result__a among the anchor's classes, with the
+# class attribute before or after href
+_DDG_CLASS = r'\bclass="(?:[^"]*\s)?result__a(?:\s[^"]*)?"'
+DDG_LINK_PATTERN = re.compile(rf'<a\b(?=[^>]*?{_DDG_CLASS})[^>]*?\bhref="([^"]+)"')
+
+# Unmatched text kept between chunks, enough to hold one split <a> tag
+DDG_TAIL_CHARS = 2048
+
+
 def _search_duckduckgo_html(topic: str, max_results: int = 8) -> List[str]:
+    """
+    Stream the results page and stop reading once max_results links are
+    found, instead of downloading and parsing the whole document.
+    """
     params = {"q": topic, "kl": "in-en"}
-    resp = requests.get("https://duckduckgo.com/html/", params=params, headers=HEADERS, timeout=20)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
     links: List[str] = []
-    for a in soup.select("a.result__a"):
-        href = a.get("href")
-        if href and href.startswith("http"):
-            links.append(href)
-        if len(links) >= max_results:
-            break
+    buf = ""
+    with SESSION.get("https://duckduckgo.com/html/", params=params, stream=True, timeout=20) as resp:
+        resp.raise_for_status()
+        resp.encoding = resp.encoding or "utf-8"
+        for chunk in resp.iter_content(8192, decode_unicode=True):
+            buf += chunk
+            end = 0
+            for match in DDG_LINK_PATTERN.finditer(buf):
+                href = unescape(match.group(1))
+                if href.startswith("http"):
+                    links.append(href)
+                    if len(links) >= max_results:
+                        return links
+                end = match.end()
+            buf = buf[end:][-DDG_TAIL_CHARS:]
     return links
 
 def _search_wikipedia_page(topic: str) -> Optional[str]:
@@ -79,70 +188,96 @@ def _search_wikipedia_page(topic: str) -> Optional[str]:
         return page.title
     return None
 
+_YT_ID = re.compile(r"watch\?v=([a-zA-Z0-9_-]{11})")
+
 def _search_youtube_ids(topic: str, max_results: int = 3) -> List[str]:
     if not YouTubeTranscriptApi:
         return []
     q = topic.replace(" ", "+")
     url = f"https://www.youtube.com/results?search_query={q}"
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=20)
+        resp = SESSION.get(url, timeout=20)
         resp.raise_for_status()
     except Exception:
         return []
+    seen = set()
     video_ids: List[str] = []
-    for match in re.finditer(r"watch\?v=([a-zA-Z0-9_-]{11})", resp.text):
+    for match in _YT_ID.finditer(resp.text):
         vid = match.group(1)
-        if vid not in video_ids:
-            video_ids.append(vid)
+        if vid in seen:
+            continue
+        seen.add(vid)
+        video_ids.append(vid)
         if len(video_ids) >= max_results:
             break
     return video_ids
 
-def search_web(topic: str, max_results: int = 8) -> Dict[str, Any]:
-    urls = []
-    try:
-        urls = _search_duckduckgo_html(topic, max_results)
-    except Exception:
-        pass
-    wiki_title = None
-    try:
-        wiki_title = _search_wikipedia_page(topic)
-    except Exception:
-        pass
-    youtube_ids: List[str] = []
-    try:
-        youtube_ids = _search_youtube_ids(topic)
-    except Exception:
-        pass
-    return {"urls": urls, "wiki_title": wiki_title, "youtube_ids": youtube_ids}
+async def search_web(topic: str, max_results: int = 8) -> Dict[str, Any]:
+    """Run the DuckDuckGo, Wikipedia and YouTube lookups concurrently."""
+    urls, wiki_title, youtube_ids = await asyncio.gather(
+        asyncio.to_thread(_search_duckduckgo_html, topic, max_results),
+        asyncio.to_thread(_search_wikipedia_page, topic),
+        asyncio.to_thread(_search_youtube_ids, topic),
+        return_exceptions=True,
+    )
+    return {
+        "urls": [] if isinstance(urls, BaseException) else urls,
+        "wiki_title": None if isinstance(wiki_title, BaseException) else wiki_title,
+        "youtube_ids": [] if isinstance(youtube_ids, BaseException) else youtube_ids,
+    }
 
 # -------------------------------------------------------------------
 # 2) SCRAPING + CONTENT EXTRACTION LAYER
 # -------------------------------------------------------------------
-def _scrape_with_trafilatura(url: str) -> Optional[str]:
-    if not trafilatura:
-        return None
-    try:
-        downloaded = trafilatura.fetch_url(url)
-        if not downloaded:
-            return None
-        return trafilatura.extract(downloaded, include_comments=False, include_tables=False, include_images=False)
-    except Exception:
-        return None
-
-def _scrape_with_bs4(url: str) -> str:
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+# Not on the pipeline path yet: collect_sources still has the LLM synthesize
+# its sources. search_web and scrape_urls are the building blocks for
+# collecting real ones.
+def _html_to_text(html) -> str:
+    """Visible text of a page; pass bytes where possible so the parser detects the encoding."""
+    if HTMLParser:
+        tree = HTMLParser(html)
+        for node in tree.css("script, style, noscript"):
+            node.decompose()
+        root = tree.body or tree.root
+        text = root.text(separator=" ") if root else ""
+        return " ".join(text.split())
+
+    soup = BeautifulSoup(html, "lxml")
     for tag in soup(["script", "style", "noscript"]):
         tag.decompose()
     text = soup.get_text(separator=" ")
     return " ".join(text.split())
 
-def scrape_url(url: str, max_chars: int = 15000) -> str:
-    text = _scrape_with_trafilatura(url) or _scrape_with_bs4(url)
+def _extract_text(html: bytes) -> str:
+    """Main text via trafilatura; BeautifulSoup only runs when it comes back empty."""
+    text = None
+    if trafilatura:
+        try:
+            text = trafilatura.extract(html, include_comments=False, include_tables=False, include_images=False)
+        except Exception:
+            text = None
+    return text or _html_to_text(html)
+
+async def scrape_url(url: str, max_chars: int = 15000) -> str:
+    text = await asyncio.to_thread(get_scraped, url)
+    if text is None:
+        # One download over the shared client; raw bytes so the encoding is detected
+        resp = await _get_with_backoff(url)
+        # Parsing is CPU work; keep it off the event loop
+        text = await asyncio.to_thread(_extract_text, resp.content)
+        await asyncio.to_thread(set_scraped, url, text)
     return text[:max_chars]
 
+# Concurrent scraping: all URLs are fetched at once over the shared client,
+# so N sources cost roughly one round-trip instead of N.
+async def scrape_urls(urls: List[str], max_chars: int = 15000) -> List[Optional[str]]:
+    """Scrape all URLs concurrently. Failed URLs come back as None, in input order."""
+    results = await asyncio.gather(
+        *(scrape_url(url, max_chars) for url in urls),
+        return_exceptions=True,
+    )
+    return [None if isinstance(r, BaseException) else r for r in results]
+
 def fetch_wikipedia_content(title: str) -> Optional[str]:
     if not wikipediaapi:
         return None
@@ -167,10 +302,7 @@ def fetch_youtube_transcript(video_id: str) -> Optional[str]:
 # -------------------------------------------------------------------
 # 3) OpenAI helper
 # -------------------------------------------------------------------
-def _call_llm(prompt: str, model: str = "gpt-4o-mini") -> str:
-    if not settings.openai_api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    response = client.responses.create(model=model, input=prompt)
+def _response_text(response) -> str:
     try:
         return response.output[0].content[0].text
     except Exception:
@@ -178,12 +310,360 @@ def _call_llm(prompt: str, model: str = "gpt-4o-mini") -> str:
             return response.output_text
         raise
 
-def validate_research(research: Dict[str, Any]) -> Dict[str, Any]:
+
+def _sampling() -> Dict[str, Any]:
+    """Sampling arguments for responses.create: the model's defaults unless LLM_TEMPERATURE is set."""
+    if settings.llm_temperature is None:
+        return {}
+    return {"temperature": settings.llm_temperature}
+
+
+# Every LLM call holds a slot of _LLM_SEM; with aiolimiter installed the
+# per-minute request and token budgets are enforced as well. Token counts
+# are estimated from the prompt length (about 4 characters per token).
+_LLM_SEM = asyncio.Semaphore(settings.max_concurrent_llm_calls)
+_LLM_RPM = (AsyncLimiter(settings.llm_requests_per_minute, 60)
+            if AsyncLimiter and settings.llm_requests_per_minute else None)
+_LLM_TPM = (AsyncLimiter(settings.llm_tokens_per_minute, 60)
+            if AsyncLimiter and settings.llm_tokens_per_minute else None)
+
+
+@asynccontextmanager
+async def llm_slot(prompt: str = ""):
+    async with _LLM_SEM:
+        if _LLM_RPM is not None:
+            await _LLM_RPM.acquire()
+        if _LLM_TPM is not None and prompt:
+            await _LLM_TPM.acquire(min(len(prompt) // 4 + 1, _LLM_TPM.max_rate))
+        yield
+
+
+async def _llm_thread(fn, *args):
+    """Run a blocking stage that makes one LLM call in a worker thread, holding an LLM slot."""
+    async with llm_slot():
+        return await asyncio.to_thread(fn, *args)
+
+
+# Transient OpenAI failures (connection errors, timeouts, 429s, 5xx, JSON
+# streams cut off mid-object) are retried with jittered exponential backoff.
+# After LLM_BREAKER_FAIL_MAX of them in a row the breaker opens: for
+# LLM_BREAKER_RESET_SECONDS calls fail at once with LLMUnavailableError
+# instead of each waiting out its retries.
+LLM_ATTEMPTS = 3
+LLM_BACKOFF_MAX = 30
+LLM_BREAKER_FAIL_MAX = 5
+LLM_BREAKER_RESET_SECONDS = 60
+
+class IncompleteJSONError(RuntimeError):
+    """A JSON response stream ended before its top-level object closed."""
+
+
+LLM_RETRYABLE = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError, IncompleteJSONError)
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker, shared by the event loop and worker threads."""
+
+    def __init__(self, name: str, fail_max: int, reset_timeout: float):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: calls go through again, but one more failure re-opens
+                self._opened_at = None
+                self._failures = self.fail_max - 1
+                return
+        raise LLMUnavailableError(f"{self.name} is failing; calls paused for up to {self.reset_timeout:.0f}s")
+
+    def trip(self):
+        """Open straight away, e.g. on a failure no retry can fix."""
+        with self._lock:
+            self._failures = self.fail_max
+            self._opened_at = time.monotonic()
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+
+OPENAI_BREAKER = CircuitBreaker("OpenAI", LLM_BREAKER_FAIL_MAX, LLM_BREAKER_RESET_SECONDS)
+
+
+def _record_failure(error: Exception):
+    """Count a retryable failure; an exhausted quota is permanent, so it opens the breaker instead."""
+    if isinstance(error, openai.RateLimitError) and error.code == "insufficient_quota":
+        OPENAI_BREAKER.trip()
+        raise LLMUnavailableError(f"OpenAI quota exhausted: {error}") from error
+    OPENAI_BREAKER.record(False)
+
+
+def resilient(fn):
+    """Route a sync or async OpenAI call through OPENAI_BREAKER, retrying transient errors."""
+    retrying = retry(
+        stop=stop_after_attempt(LLM_ATTEMPTS),
+        wait=wait_random_exponential(multiplier=1, max=LLM_BACKOFF_MAX),
+        retry=retry_if_exception_type(LLM_RETRYABLE),
+        reraise=True,
+    )
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_attempt(*args, **kwargs):
+            OPENAI_BREAKER.check()
+            try:
+                result = await fn(*args, **kwargs)
+            except LLM_RETRYABLE as e:
+                _record_failure(e)
+                raise
+            OPENAI_BREAKER.record(True)
+            return result
+
+        return retrying(async_attempt)
+
+    @functools.wraps(fn)
+    def attempt(*args, **kwargs):
+        OPENAI_BREAKER.check()
+        try:
+            result = fn(*args, **kwargs)
+        except LLM_RETRYABLE as e:
+            _record_failure(e)
+            raise
+        OPENAI_BREAKER.record(True)
+        return result
+
+    return retrying(attempt)
+
+
+@cached_call
+@resilient
+def _call_llm(prompt: str, model: str = "gpt-4o-mini") -> str:
+    if not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    response = client.responses.create(model=model, input=prompt, **_sampling())
+    return _response_text(response)
+
+
+def results_cacheable() -> bool:
+    """Whole-pipeline results are only reused when the LLM calls are deterministic."""
+    return settings.llm_temperature == 0
+
+
+# -------------------------------------------------------------------
+# Streaming JSON calls
+# -------------------------------------------------------------------
+# The JSON agents stream the response and stop reading as soon as the
+# top-level object closes, instead of waiting for the whole generation.
+JSON_OBJECT_FORMAT = {"format": {"type": "json_object"}}
+
+
+class _JsonObjectScanner:
+    """Tracks brace depth over streamed text, ignoring braces inside strings."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> int:
+        """Index just past the closing brace of the top-level object, or -1."""
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.started
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
+
+def _accept_delta(scanner: _JsonObjectScanner, parts: List[str], event) -> bool:
+    """Collect one stream event's text; True once the JSON object is complete."""
+    if event.type != "response.output_text.delta":
+        return False
+    end = scanner.feed(event.delta)
+    parts.append(event.delta if end < 0 else event.delta[:end])
+    return end >= 0
+
+
+@cached_call
+@resilient
+def _call_llm_json(prompt: str, model: str = "gpt-4o-mini") -> str:
+    if not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    scanner, parts = _JsonObjectScanner(), []
+    with client.responses.create(
+        model=model, input=prompt, text=JSON_OBJECT_FORMAT, **_sampling(), stream=True
+    ) as stream:
+        for event in stream:
+            if _accept_delta(scanner, parts, event):
+                break
+        else:
+            # Raised so the call is retried and the cut-off text is never cached
+            raise IncompleteJSONError("JSON response stream ended mid-object")
+    return "".join(parts)
+
+
+@cached_call
+@resilient
+async def _acall_llm_json(prompt: str, model: str = "gpt-4o-mini", text_format: Dict[str, Any] = None) -> str:
+    if not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    scanner, parts = _JsonObjectScanner(), []
+    async with llm_slot(prompt):
+        stream = await aclient.responses.create(
+            model=model, input=prompt, text=text_format or JSON_OBJECT_FORMAT,
+            **_sampling(), stream=True,
+        )
+        async with stream:
+            async for event in stream:
+                if _accept_delta(scanner, parts, event):
+                    break
+            else:
+                raise IncompleteJSONError("JSON response stream ended mid-object")
+    return "".join(parts)
+
+
+# -------------------------------------------------------------------
+# Request coalescing across concurrent pipelines
+# -------------------------------------------------------------------
+# Embedding requests arriving within BATCH_WINDOW_MS of each other go out as
+# one embeddings call (up to MAX_BATCH inputs). The Responses API takes one
+# prompt per request, so completions are not batched; identical prompts
+# already in flight (e.g. two requests for the same topic) share one call.
+BATCH_WINDOW_MS = 20
+MAX_BATCH = 16
+
+
+@resilient
+async def _create_embeddings(model: str, texts: List[str]):
+    return await aclient.embeddings.create(model=model, input=texts)
+
+
+class BatchingLLMClient:
+    def __init__(self, batch_ms: int = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.batch_ms = batch_ms
+        self.max_batch = max_batch
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Strong references: the loop only keeps weak ones to running tasks
+        self._tasks: set = set()
+
+    async def complete(self, prompt: str, model: str = "gpt-4o-mini", text_format: Dict[str, Any] = None) -> str:
+        key = (model, prompt, canonical_json(text_format) if text_format else None)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(_acall_llm_json(prompt, model, text_format))
+            self._inflight[key] = future
+            future.add_done_callback(functools.partial(self._settle, key))
+        # Shielded: one caller giving up must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    def _settle(self, key: tuple, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        # Mark the error retrieved: every caller may have given up before it finished
+        if not future.cancelled():
+            future.exception()
+
+    async def embed(self, text: str, model: str = "text-embedding-3-small") -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((model, text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        by_model = defaultdict(list)
+        for model, text, future in batch:
+            by_model[model].append((text, future))
+        for model, items in by_model.items():
+            task = asyncio.create_task(self._send_embeddings(model, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_embeddings(self, model: str, items: List[tuple]):
+        texts = list(dict.fromkeys(text for text, _ in items))
+        try:
+            async with llm_slot(" ".join(texts)):
+                response = await _create_embeddings(model, texts)
+            vectors = {text: row.embedding for text, row in zip(texts, response.data)}
+            results = [(future, vectors[text]) for text, future in items]
+        except asyncio.CancelledError:
+            for _, future in items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, vector in results:
+            if not future.done():
+                future.set_result(vector)
+
+
+LLM_BATCHER = BatchingLLMClient()
+
+# Research JSON beyond this is cut before embedding (model limit is 8191 tokens)
+EMBED_MAX_CHARS = 24000
+
+
+@cached_call
+async def _embed_text(text: str, model: str = "text-embedding-3-small") -> List[float]:
+    return await LLM_BATCHER.embed(text[:EMBED_MAX_CHARS], model)
+
+
+async def _embed_topic(topic: str) -> Optional[List[float]]:
+    """Topic embedding for the result cache; None if the embedding call fails."""
+    try:
+        return await _embed_text(topic.strip().lower())
+    except Exception as e:
+        print(f"⚠️ Topic embedding failed: {e}")
+        return None
+
+
+@semantic_cached(namespace="validate", embed=_embed_text)
+async def validate_research(research: Dict[str, Any], research_json: Optional[str] = None) -> Dict[str, Any]:
     """
     LLM Validation Agent:
     Cleans up the research summary, highlights caveats, and adds confidence signals.
     """
-    research_json = json.dumps(research, ensure_ascii=False, indent=2)
+    research_json = research_json or canonical_json(research)
     prompt = f"""
 You are a senior research validation analyst.
 
@@ -207,10 +687,10 @@ Return VALID JSON ONLY in this structure:
 Research JSON:
 {research_json}
 """
-    raw = _call_llm(prompt, model="gpt-4o-mini")
+    raw = await LLM_BATCHER.complete(prompt, model="gpt-4o-mini")
     try:
-        data = json.loads(raw)
-    except Exception:
+        data = ValidationResult.model_validate_json(raw).model_dump()
+    except ValueError:
         data = {
             "validated_summary": research.get("summary", ""),
             "validated_key_points": research.get("key_points", []),
@@ -221,12 +701,13 @@ Research JSON:
     return data
 
 
-def plan_charts_from_research(research: Dict[str, Any]) -> Dict[str, Any]:
+@semantic_cached(namespace="charts", embed=_embed_text)
+async def plan_charts_from_research(research: Dict[str, Any], research_json: Optional[str] = None) -> Dict[str, Any]:
     """
     LLM Chart Planning Agent:
     Derives numeric chart_data from the research.
     """
-    research_json = json.dumps(research, ensure_ascii=False, indent=2)
+    research_json = research_json or canonical_json(research)
     prompt = f"""
 You are a data visualization strategist.
 
@@ -248,10 +729,10 @@ Return VALID JSON ONLY in this structure:
 Research JSON:
 {research_json}
 """
-    raw = _call_llm(prompt, model="gpt-4o-mini")
+    raw = await LLM_BATCHER.complete(prompt, model="gpt-4o-mini")
     try:
-        data = json.loads(raw)
-    except Exception:
+        data = ChartPlan.model_validate_json(raw).model_dump()
+    except ValueError:
         data = {
             "chart_data": {
                 "market_size": {"2020": 8, "2021": 9, "2022": 10},
@@ -261,16 +742,16 @@ Research JSON:
                 "trend_frequency": {"Automation": 22, "Analytics": 14}
             }
         }
-    data.setdefault("chart_data", {})
     return data
 
 
-def generate_recommendations(research: Dict[str, Any]) -> Dict[str, Any]:
+@semantic_cached(namespace="recs", embed=_embed_text)
+async def generate_recommendations(research: Dict[str, Any], research_json: Optional[str] = None) -> Dict[str, Any]:
     """
     LLM Recommendation Agent:
     Produces executive recommendations and next-step actions.
     """
-    research_json = json.dumps(research, ensure_ascii=False, indent=2)
+    research_json = research_json or canonical_json(research)
     prompt = f"""
 You are a strategy consultant.
 
@@ -288,10 +769,10 @@ Return VALID JSON ONLY in this structure:
 Research JSON:
 {research_json}
 """
-    raw = _call_llm(prompt, model="gpt-4o-mini")
+    raw = await LLM_BATCHER.complete(prompt, model="gpt-4o-mini")
     try:
-        data = json.loads(raw)
-    except Exception:
+        data = Recommendations.model_validate_json(raw).model_dump()
+    except ValueError:
         data = {
             "key_recommendations": [],
             "action_plan": [],
@@ -300,6 +781,139 @@ Research JSON:
     return data
 
 
+# -------------------------------------------------------------------
+# Composite analysis: the three agents above in one structured call
+# -------------------------------------------------------------------
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+_NUMBER_MAP = {"type": "object", "additionalProperties": {"type": "number"}}
+
+ANALYSIS_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "research_analysis",
+        # Chart series have free-form keys, which strict mode cannot express
+        "strict": False,
+        "schema": {
+            "type": "object",
+            "required": ["validation", "chart_data", "recommendations"],
+            "properties": {
+                "validation": {
+                    "type": "object",
+                    "required": ["validated_summary", "validated_key_points", "caveats",
+                                 "confidence", "things_to_double_check"],
+                    "properties": {
+                        "validated_summary": {"type": "string"},
+                        "validated_key_points": _STRING_LIST,
+                        "caveats": _STRING_LIST,
+                        "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+                        "things_to_double_check": _STRING_LIST,
+                    },
+                },
+                "chart_data": {
+                    "type": "object",
+                    "properties": {
+                        key: _NUMBER_MAP
+                        for key in ("market_size", "market_share", "growth_projection",
+                                    "competitor_strengths", "trend_frequency")
+                    },
+                },
+                "recommendations": {
+                    "type": "object",
+                    "required": ["key_recommendations", "action_plan", "summary_recommendations"],
+                    "properties": {
+                        "key_recommendations": _STRING_LIST,
+                        "action_plan": _STRING_LIST,
+                        "summary_recommendations": _STRING_LIST,
+                    },
+                },
+            },
+        },
+    }
+}
+
+
+@semantic_cached(namespace="analysis", embed=_embed_text)
+async def analyze_research_composite(research: Dict[str, Any], research_json: Optional[str] = None):
+    """
+    LLM Analysis Agent:
+    Validation, chart data and recommendations from a single call. Returns
+    (validation, chart_plan, recommendations) shaped like the separate
+    agents' output, or None if the response can't be used.
+    """
+    research_json = research_json or canonical_json(research)
+    prompt = f"""
+You are a senior research analyst, data visualization strategist and strategy
+consultant in one. From the research JSON below, produce a single JSON object:
+
+"validation": clean and tighten the summary, refine key points, list caveats
+and weak assumptions, and rate overall confidence as "high", "medium" or "low".
+
+"chart_data": realistic numeric values for market_size (by year),
+market_share (by company), growth_projection (by year),
+competitor_strengths and trend_frequency. When real numbers are missing,
+fabricate plausible but conservative values.
+
+"recommendations": practical key recommendations, an action plan and summary
+recommendations for an executive audience.
+
+Research JSON:
+{research_json}
+"""
+    raw = await LLM_BATCHER.complete(prompt, model="gpt-4o-mini", text_format=ANALYSIS_FORMAT)
+    try:
+        data = CompositeAnalysis.model_validate_json(raw).model_dump()
+        return data["validation"], {"chart_data": data["chart_data"]}, data["recommendations"]
+    except ValueError:
+        print("[Analysis] Composite response unusable; falling back to separate agents.")
+        return None
+
+
+ANALYSIS_AGENTS = ("validation", "chart_plan", "recommendations")
+
+ANALYSIS_DONE_MESSAGES = {
+    "validation": "✅ Insights validated.",
+    "chart_plan": "📊 Chart data derived.",
+    "recommendations": "📌 Executive recommendations ready.",
+}
+
+
+async def _named(name: str, coro):
+    return name, await coro
+
+
+async def _embed_research(research_json: str) -> Optional[List[float]]:
+    """Embedding of the research JSON for the agents' semantic caches; None if the call fails."""
+    try:
+        return await _embed_text(research_json)
+    except Exception as e:
+        print(f"⚠️ Research embedding failed: {e}")
+        return None
+
+
+async def iter_analysis_agents(research: Dict[str, Any], research_json: Optional[str] = None):
+    """
+    The validation, chart planning and recommendation agents only read the
+    research summary, so run them concurrently on one shared serialisation
+    and embedding, and yield (name, result) as each one finishes. With
+    COMPOSITE_ANALYSIS enabled they are asked in one structured call instead.
+    """
+    research_json = research_json or canonical_json(research)
+    shared = {"research_json": research_json, "research_embedding": await _embed_research(research_json)}
+    if settings.composite_analysis:
+        combined = await analyze_research_composite(research, **shared)
+        if combined is not None:
+            for item in zip(ANALYSIS_AGENTS, combined):
+                yield item
+            return
+
+    agents = (
+        validate_research(research, **shared),
+        plan_charts_from_research(research, **shared),
+        generate_recommendations(research, **shared),
+    )
+    for finished in asyncio.as_completed([_named(n, c) for n, c in zip(ANALYSIS_AGENTS, agents)]):
+        yield await finished
+
 
 # -------------------------------------------------------------------
 # 4) Source collection
@@ -308,7 +922,7 @@ def collect_sources(topic: str, max_results: int = 8) -> List[Dict[str, str]]:
     prompt = f"You are an AI research engine. Generate {max_results} high-quality synthetic sources about:\n\"{topic}\"\nReturn JSON with a \"sources\" list."
     raw = _call_llm(prompt)
     try:
-        data = json.loads(raw)
+        data = orjson.loads(raw)
         return data.get("sources", [])
     except Exception:
         return [{"url": f"https://synthetic.example.com/{topic}", "title": f"Overview of {topic}", "content": f"Synthetic summary for {topic}."}]
@@ -316,14 +930,51 @@ def collect_sources(topic: str, max_results: int = 8) -> List[Dict[str, str]]:
 # -------------------------------------------------------------------
 # 5) Research summarizer
 # -------------------------------------------------------------------
-import json
+# Near-duplicate sources (syndicated or mirrored articles) are collapsed
+# before summarising, keeping the longest copy. Only the first
+# DEDUP_PREFIX_CHARS of each source are compared.
+DEDUP_THRESHOLD = 0.8
+DEDUP_NUM_PERM = 128
+DEDUP_PREFIX_CHARS = 2048
+DEDUP_SHINGLE_WORDS = 5
+
+
+def _minhash(text: str) -> "MinHash":
+    words = text[:DEDUP_PREFIX_CHARS].lower().split()
+    m = MinHash(num_perm=DEDUP_NUM_PERM)
+    for i in range(max(len(words) - DEDUP_SHINGLE_WORDS + 1, 1)):
+        m.update(" ".join(words[i:i + DEDUP_SHINGLE_WORDS]).encode())
+    return m
+
+
+def _dedupe_sources(sources: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Drop near-duplicate sources (MinHash LSH); order is preserved. No-op without datasketch."""
+    if not MinHashLSH or len(sources) < 2:
+        return sources
+
+    lsh = MinHashLSH(threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM)
+    keep = []
+    # Longest first, so each cluster is represented by its longest member
+    for i in sorted(range(len(sources)), key=lambda i: -len(sources[i].get("content") or "")):
+        content = sources[i].get("content") or ""
+        if not content.strip():
+            keep.append(i)
+            continue
+        m = _minhash(content)
+        if lsh.query(m):
+            continue
+        lsh.insert(str(i), m)
+        keep.append(i)
+    return [sources[i] for i in sorted(keep)]
+
 
 def build_research_summary(topic: str, sources: List[Dict[str, str]]) -> Dict[str, Any]:
-    joined = "\n\n".join([f"### Source {i}\nURL: {s['url']}\nCONTENT:\n{s['content']}" for i, s in enumerate(sources, 1)])
+    unique = _dedupe_sources(sources)
+    joined = "\n\n".join([f"### Source {i}\nURL: {s['url']}\nCONTENT:\n{s['content']}" for i, s in enumerate(unique, 1)])
     system = f"You are a senior research analyst. Summarize the web research about \"{topic}\" and return JSON with keys: topic, summary, key_points, statistics, trends, challenges, opportunities, sources_used."
     raw = _call_llm(system + "\n" + joined)
     try:
-        data = json.loads(raw)
+        data = orjson.loads(raw)
     except Exception:
         data = {"topic": topic, "summary": raw[:3000], "key_points": [], "statistics": [], "trends": [], "challenges": [], "opportunities": [], "sources_used": [s["url"] for s in sources]}
     data.setdefault("topic", topic)
@@ -333,15 +984,10 @@ def build_research_summary(topic: str, sources: List[Dict[str, str]]) -> Dict[st
 # -------------------------------------------------------------------
 # 6) Slide plan generator (FIXED & STABLE)
 # -------------------------------------------------------------------
-def generate_slide_plan(research: Dict[str, Any], theme_config: Dict[str, Any] = None) -> Dict[str, Any]:
-    import json
+def _slide_plan_prompt(research_json: str, theme_config: Dict[str, Any] = None) -> str:
+    theme_json = orjson.dumps(theme_config or {}).decode()
 
-    research_json = json.dumps(research, ensure_ascii=False, indent=2)
-
-
-    theme_json = json.dumps(theme_config or {}, ensure_ascii=False, indent=2)
-
-    prompt = f"""
+    return f"""
 You are a senior strategy consultant (McKinsey/BCG style) and a strict JSON generator.
 
 Your task:
@@ -397,13 +1043,13 @@ Now generate the slide-plan JSON based on the research below:
 {research_json}
 """
 
-    raw = _call_llm(prompt, model="gpt-4o-mini")  # upgrade model for reliability
 
+def _parse_slide_plan(raw: str, research: Dict[str, Any], theme_config: Dict[str, Any] = None) -> Dict[str, Any]:
     # ---------------------------------------
     # JSON Parsing + Recovery
     # ---------------------------------------
     try:
-        data = json.loads(raw)
+        data = orjson.loads(raw)
     except Exception:
         print("[SlidePlan] LLM returned invalid JSON. Using fallback plan.")
         data = {
@@ -425,6 +1071,161 @@ Now generate the slide-plan JSON based on the research below:
     return data
 
 
+def generate_slide_plan(research: Dict[str, Any], theme_config: Dict[str, Any] = None,
+                        research_json: Optional[str] = None) -> Dict[str, Any]:
+    prompt = _slide_plan_prompt(research_json or canonical_json(research), theme_config)
+    raw = _call_llm_json(prompt, model="gpt-4o-mini")  # upgrade model for reliability
+    return _parse_slide_plan(raw, research, theme_config)
+
+
+class _SectionScanner:
+    """
+    Picks the finished objects of the top-level "sections" array out of
+    streamed slide-plan JSON, so slides can be reported before the whole
+    plan has arrived.
+    """
+
+    def __init__(self):
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escaped = False
+        self.key_parts: Optional[List[str]] = None
+        self.last_string = ""
+        self.key = ""
+        self.section_parts: Optional[List[str]] = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        sections = []
+        key_from = section_from = 0
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.key_parts is not None:
+                        self.key_parts.append(text[key_from:i])
+                        self.last_string = "".join(self.key_parts)
+                        self.key_parts = None
+            elif ch == '"':
+                self.in_string = True
+                if len(self.stack) == 1:
+                    self.key_parts, key_from = [], i + 1
+            elif ch == ":" and len(self.stack) == 1:
+                self.key = self.last_string
+            elif ch in "{[":
+                self.stack.append(ch)
+                if self.key == "sections" and self.stack == ["{", "[", "{"]:
+                    self.section_parts, section_from = [], i
+            elif ch in "}]":
+                if self.section_parts is not None and self.stack == ["{", "[", "{"]:
+                    self.section_parts.append(text[section_from:i + 1])
+                    try:
+                        sections.append(orjson.loads("".join(self.section_parts)))
+                    except orjson.JSONDecodeError:
+                        pass
+                    self.section_parts = None
+                if self.stack:
+                    self.stack.pop()
+        if self.key_parts is not None:
+            self.key_parts.append(text[key_from:])
+        if self.section_parts is not None:
+            self.section_parts.append(text[section_from:])
+        return sections
+
+
+@resilient
+async def _open_json_stream(prompt: str, model: str):
+    return await aclient.responses.create(
+        model=model, input=prompt, text=JSON_OBJECT_FORMAT,
+        **_sampling(), stream=True,
+    )
+
+
+async def generate_slide_plan_stream(research: Dict[str, Any], theme_config: Dict[str, Any] = None,
+                                     research_json: Optional[str] = None):
+    """
+    Streaming generate_slide_plan: yields ("slide", section) for each section
+    as soon as it has been generated, then ("plan", slide_plan). Shares the
+    LLM cache entry of generate_slide_plan.
+    """
+    model = "gpt-4o-mini"
+    prompt = _slide_plan_prompt(research_json or canonical_json(research), theme_config)
+    cache_key = llm_cache_key(model, prompt)
+    raw = await asyncio.to_thread(LLM_CACHE.get, cache_key) if LLM_CACHE is not None else None
+    sections = _SectionScanner()
+
+    if raw is None:
+        if not settings.openai_api_key:
+            raise RuntimeError("OPENAI_API_KEY not set")
+        scanner, parts = _JsonObjectScanner(), []
+        done = False
+        async with llm_slot(prompt):
+            # Only opening the stream is retried: slides already reported can't be taken back
+            stream = await _open_json_stream(prompt, model)
+            async with stream:
+                async for event in stream:
+                    done = _accept_delta(scanner, parts, event)
+                    if event.type == "response.output_text.delta":
+                        for section in sections.feed(parts[-1]):
+                            yield "slide", section
+                    if done:
+                        break
+        raw = "".join(parts)
+        # A plan cut off mid-stream falls back below but is never cached
+        if done and LLM_CACHE is not None:
+            await asyncio.to_thread(LLM_CACHE.set, cache_key, raw, expire=LLM_CACHE_TTL)
+    else:
+        for section in sections.feed(raw):
+            yield "slide", section
+
+    yield "plan", _parse_slide_plan(raw, research, theme_config)
+
+
+def fill_plan_template(template: Dict[str, Any], research: Dict[str, Any], theme_config: Dict[str, Any] = None,
+                       research_json: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Slide plan for a known section layout: the model only writes the title,
+    bullets and chart values, so the schema and layout rules of the full
+    slide-plan prompt are left out.
+    """
+    research_json = research_json or canonical_json(research)
+    headings_json = orjson.dumps(template["headings"]).decode()
+
+    prompt = f"""
+You are a senior strategy consultant writing a business slide deck. Return valid JSON only.
+
+Use exactly these section headings, in this order:
+{headings_json}
+
+JSON keys: "title", "subtitle", "sections" (list of {{"heading", "bullets"}} with 4-7 short bullets each),
+"conclusion_bullets" (list), "chart_data" with realistic numbers for "market_size", "market_share",
+"growth_projection", "competitor_strengths" and "trend_frequency" (each a label -> number object).
+
+Research:
+{research_json}
+"""
+
+    raw = _call_llm_json(prompt, model="gpt-4o-mini")
+
+    try:
+        data = orjson.loads(raw)
+    except Exception:
+        print("[SlidePlan] Template fill returned invalid JSON. Generating the full plan.")
+        return generate_slide_plan(research, theme_config, research_json)
+
+    data.setdefault("title", research.get("topic", "Report"))
+    data.setdefault("subtitle", "Auto-generated")
+    data.setdefault("sections", [])
+    data.setdefault("conclusion_bullets", [])
+    data.setdefault("chart_data", {})
+    data.setdefault("theme_config", theme_config or {})
+
+    return data
+
+
 def auto_expand_slide_plan(slide_plan: Dict[str, Any]) -> Dict[str, Any]:
     """
     If the LLM failed or produced too few sections, expand with a guaranteed fallback.
@@ -454,524 +1255,426 @@ def auto_expand_slide_plan(slide_plan: Dict[str, Any]) -> Dict[str, Any]:
 
     return slide_plan
 
-# -------------------------------------------------------------------
-# 7) PPT generator (Professional Dark Theme)
-# -------------------------------------------------------------------
-# -------------------------------------------------------------------
-# 7) PPT generator (Professional Dark Theme)
-# -------------------------------------------------------------------
 
-def hex_to_rgb(hex_str):
-    if not hex_str:
-        return RGBColor(0, 0, 0)
-    hex_str = hex_str.lstrip('#')
-    return RGBColor(int(hex_str[0:2], 16), int(hex_str[2:4], 16), int(hex_str[4:6], 16))
-# -------------------------------
-# COLOR UTILITIES (ADD THESE)
-# -------------------------------
-def is_dark_color(hex_color: str) -> bool:
-    """Return True if a hex color is dark."""
-    hex_color = hex_color.lstrip("#")
-    r = int(hex_color[0:2], 16)
-    g = int(hex_color[2:4], 16)
-    b = int(hex_color[4:6], 16)
-    luminance = 0.2126*r + 0.7152*g + 0.0722*b
-    return luminance < 128
-
-def choose_text_color(bg_hex: str) -> RGBColor:
-    """Automatically selects black or white text depending on background color."""
-    return RGBColor(255, 255, 255) if is_dark_color(bg_hex) else RGBColor(20, 20, 20)    
-
-def _apply_theme(slide, theme_config):
-    theme_config = theme_config or {}
-    bg_color = theme_config.get("background_color", "#121212")
-    
-    fill = slide.background.fill
-    fill.solid()
-    fill.fore_color.rgb = hex_to_rgb(bg_color)
-
-    # Gradient support (simple vertical gradient simulation if requested)
-    if theme_config.get("theme") == "gradient":
-        # python-pptx doesn't support gradients easily on background directly via high-level API
-        # So we stick to solid background or add a shape behind everything.
-        # For robustness, we will stick to solid background color[0] or background_color
-        pass
-
-def _add_rounded_rect_background(slide, left, top, width, height, theme_config):
-    """Adds an auto-contrast rounded rectangle background behind text and returns both the shape and card color."""
-    radius = theme_config.get("corner_radius", 40)
-    if radius <= 0:
-        return None, None
-
-    bg_hex = theme_config.get("background_color", "#121212")
-    dark_bg = is_dark_color(bg_hex)
-
-    # Create shape
-    shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, width, height)
-
-    # Determine card color
-    if dark_bg:
-        card_color = RGBColor(255, 255, 255)  # white card on dark bg
-        transparency = 0.20
-    else:
-        card_color = RGBColor(0, 0, 0)        # black card on light bg
-        transparency = 0.40
+# Speculative slide planning: the plan is drafted from the research summary
+# while the analysis agents run, then the agents' output is patched in: the
+# validated summary and key points replace the draft's unvalidated ones. The
+# draft is thrown away and the plan regenerated when validation rates the
+# research as low confidence, since the draft trusted it unchecked.
+async def _plan_skeleton(topic: str, research_summary: Dict[str, Any], theme_config: Dict[str, Any] = None,
+                         topic_embedding: Optional[List[float]] = None,
+                         research_json: Optional[str] = None) -> Dict[str, Any]:
+    """Fill the stored layout of this topic's family, or plan from scratch and store its layout."""
+    embedding = topic_embedding if topic_embedding is not None else await _embed_topic(topic)
+    template = await PLAN_TEMPLATES.get(embedding, theme_config) if embedding is not None else None
+    if template is not None:
+        return await _llm_thread(fill_plan_template, template, research_summary, theme_config, research_json)
 
-    # Apply styling
-    shape.fill.solid()
-    shape.fill.fore_color.rgb = card_color
-    shape.fill.transparency = transparency
+    plan = await _llm_thread(generate_slide_plan, research_summary, theme_config, research_json)
+    if embedding is not None:
+        await PLAN_TEMPLATES.add(embedding, theme_config, plan)
+    return plan
 
-    shape.line.fill.background()
 
-    # Rounded corner radius (0–1 range)
-    try:
-        shape.adjustments[0] = radius / 100.0
-    except:
-        pass
-
-    return shape, card_color
-
-
-
-def _add_title_slide(prs: Presentation, title: str, subtitle: str, theme_config: Dict[str, Any]):
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    _apply_theme(slide, theme_config)
-    
-    tc = theme_config or {}
-    font_family = tc.get("font_family", "Arial")
-    heading_color = hex_to_rgb(tc.get("accent_color", "#38BDF8"))
-    title_color = heading_color
-    sub_color = heading_color
-
-    # Title
-    tx = slide.shapes.add_textbox(Inches(1), Inches(2.5), Inches(11.33), Inches(2))
-    tf = tx.text_frame
-    p = tf.paragraphs[0]
-    p.text = title
-    p.font.bold = True
-    p.font.size = Pt(48)
-    p.font.color.rgb = title_color
-    p.font.name = font_family
-    p.alignment = PP_ALIGN.LEFT
-    
-    # Subtitle
-    tx2 = slide.shapes.add_textbox(Inches(1), Inches(4.5), Inches(11.33), Inches(2))
-    tf2 = tx2.text_frame
-    p2 = tf2.paragraphs[0]
-    p2.text = subtitle
-    p2.font.size = Pt(24)
-    p2.font.color.rgb = sub_color
-    p2.font.name = font_family
-    p2.alignment = PP_ALIGN.LEFT
-    return slide
-
-def _add_bullet_slide(prs: Presentation, heading: str, bullets: List[str], theme_config: Dict[str, Any]):
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    _apply_theme(slide, theme_config)
-    
-    tc = theme_config or {}
-    font_family = tc.get("font_family", "Arial")
-
-    bg_hex = tc.get("background_color", "#121212")
-
-    # --- Auto contrast heading color ---
-    heading_color = hex_to_rgb(tc.get("accent_color", "#38BDF8"))
-
-
-    # --- Auto contrast bullet color ---
-    card_shape, card_color = _add_rounded_rect_background(
-    slide, Inches(0.5), Inches(1.8), Inches(12), Inches(5), tc
-)
+def _speculation_holds(validation: Dict[str, Any]) -> bool:
+    return validation.get("confidence") != "low"
 
-    # Decide bullet text color based on card color
-    if card_color == RGBColor(255, 255, 255):  # white card
-        text_color = RGBColor(30, 30, 30)      # dark bullets
-    else:
-        text_color = RGBColor(240, 240, 240)   # light bullets
-
-    # Heading
-    tx = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(12), Inches(1))
-    tf = tx.text_frame
-    p = tf.paragraphs[0]
-    p.text = heading
-    p.font.bold = True
-    p.font.size = Pt(36)
-    p.font.color.rgb = heading_color
-    p.font.name = font_family
-
-    
-    # Bullets
-    txb = slide.shapes.add_textbox(
-    Inches(0.9),  # moves text right slightly
-    Inches(2.2),  # moves text lower to fit inside card
-    Inches(11.0), # slightly narrower
-    Inches(4.2)   # adjusted height
-)
 
-    tfb = txb.text_frame
-    tfb.word_wrap = True
-    tfb.clear()
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
 
+
+def _set_section(sections: List[Dict[str, Any]], heading: str, bullets: List[str], position: Optional[int] = None):
+    """Replace the section with this heading (case-insensitive), or add it (at `position`, else last)."""
     if not bullets:
-        bullets = ["Insight coming soon", "More data required"]
-
-    for bullet in bullets:
-        para = tfb.add_paragraph()
-        para.text = f"• {bullet}"
-        para.font.size = Pt(22)
-        para.font.color.rgb = text_color
-        para.font.name = font_family
-        para.level = 0
-        para.space_after = Pt(12)
-        para.space_before = Pt(2)
-        para.line_spacing = 1.3
-
-    return slide
-
-
-def _add_sources_slide(prs: Presentation, sources: List[str], theme_config: Dict[str, Any]):
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    _apply_theme(slide, theme_config)
-    
-    tc = theme_config or {}
-    font_family = tc.get("font_family", "Arial")
-
-    # ADD THIS – you forgot it earlier
-    bg_hex = tc.get("background_color", "#121212")
-
-    # ---------- AUTO CONTRAST HEADINGS ----------
-    heading_color = hex_to_rgb(tc.get("accent_color", "#38BDF8"))
-
-    # ---------- AUTO CONTRAST SUBTEXT ----------
-    if is_dark_color(bg_hex):
-        subtext_color = hex_to_rgb(tc.get("subtext_color", "#B4B4B4"))
+        return
+    for section in sections:
+        if str(section.get("heading", "")).strip().lower() == heading.lower():
+            section["bullets"] = bullets
+            return
+    section = {"heading": heading, "bullets": bullets}
+    if position is None:
+        sections.append(section)
     else:
-        subtext_color = RGBColor(40, 40, 40)
-
-
-    # ----------------------------------------------------
-    # Heading
-    # ----------------------------------------------------
-    tx = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(12), Inches(1))
-    tf = tx.text_frame
-    p = tf.paragraphs[0]
-    p.text = "Sources"
-    p.font.bold = True
-    p.font.size = Pt(36)
-    p.font.color.rgb = heading_color
-    p.font.name = font_family
-
-    
-
-    # ----------------------------------------------------
-    # Source list text
-    # ----------------------------------------------------
-    txb = slide.shapes.add_textbox(Inches(0.7), Inches(2.0), Inches(11.6), Inches(4.6))
-    tfb = txb.text_frame
-    tfb.word_wrap = True
-    
-    for s in sources[:8]:
-        text = s.get("title") or s.get("url") or str(s)
-        para = tfb.add_paragraph()
-        para.text = text
-        para.font.size = Pt(14)
-        para.font.color.rgb = subtext_color
-        para.font.name = font_family
-        para.space_after = Pt(6)
-
-    return slide
-
-
-def _add_chart_slide(prs: Presentation, chart_path: str, theme_config: Dict[str, Any]):
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    _apply_theme(slide, theme_config)
-
-    tc = theme_config or {}
-    font_family = tc.get("font_family", "Arial")
-    bg_hex = tc.get("background_color", "#121212")
-
-    # ---------- AUTO CONTRAST HEADING ----------
-    heading_color = hex_to_rgb(tc.get("accent_color", "#38BDF8"))
-
-    # Title from filename
-    title = os.path.basename(chart_path)\
-                .replace("chart_", "")\
-                .replace(".png", "")\
-                .replace("_", " ")\
-                .title()
-
-    # Title text
-    tx = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(12), Inches(1))
-    tf = tx.text_frame
-    p = tf.paragraphs[0]
-    p.text = title
-    p.font.bold = True
-    p.font.size = Pt(36)
-    p.font.color.rgb = heading_color
-    p.font.name = font_family
-
-    # ---------- Optional card behind chart ----------
-    # Optional card behind chart
-    card_shape, card_color = _add_rounded_rect_background(
-        slide,
-        Inches(0.6), Inches(1.4),
-        prs.slide_width - Inches(1.2),
-        prs.slide_height - Inches(2.0),
-        tc
-    )
+        sections.insert(position, section)
+
+
+def _fill_slide_plan(skeleton: Dict[str, Any], enriched: Dict[str, Any]) -> Dict[str, Any]:
+    validation = enriched.get("validated") or {}
+    recommendations = enriched.get("recommendations") or {}
+    chart_plan = enriched.get("chart_plan") or {}
+
+    plan = {**skeleton, "sections": [dict(section) for section in skeleton.get("sections", [])]}
+    summary = (validation.get("validated_summary") or "").strip()
+    _set_section(plan["sections"], "Executive Summary", _SENTENCE_END.split(summary) if summary else [], 0)
+    _set_section(plan["sections"], "Key Findings", validation.get("validated_key_points") or [], 1)
+    _set_section(plan["sections"], "Key Caveats", validation.get("caveats") or [])
+    _set_section(plan["sections"], "Things to Double-Check", validation.get("things_to_double_check") or [])
+    _set_section(plan["sections"], "Key Recommendations", recommendations.get("key_recommendations") or [])
+    _set_section(plan["sections"], "Action Plan", recommendations.get("action_plan") or [])
+    if recommendations.get("summary_recommendations"):
+        plan["conclusion_bullets"] = recommendations["summary_recommendations"]
+    plan["chart_data"] = {**plan.get("chart_data", {}), **chart_plan.get("chart_data", {})}
+    return plan
 
-    # Send card backwards so chart stays visible
-    if card_shape:
-        card_shape.z_order = 1
-
-
-    # ---------- Chart placement (safe margins) ----------
-    left = Inches(0.85)
-    top = Inches(1.55)
-    max_width = prs.slide_width - Inches(1.7)
-    max_height = prs.slide_height - Inches(2.2)
-
-    pic = slide.shapes.add_picture(chart_path, left, top)
-
-    # -------- AUTO SCALE TO FIT --------
-    # Scale width first
-    if pic.width > max_width:
-        scale = max_width / pic.width
-        pic.width = int(pic.width * scale)
-        pic.height = int(pic.height * scale)
+# -------------------------------------------------------------------
+# Streaming pipeline (ASYNC GENERATOR) — MULTI-AGENT VERSION
+# -------------------------------------------------------------------
+def _slide_event(section: Dict[str, Any]) -> Dict[str, Any]:
+    return {"status": "slide", "slide": section, "message": f"🧩 Slide planned: {section.get('heading', '')}"}
 
-    # Scale height if needed
-    if pic.height > max_height:
-        scale = max_height / pic.height
-        pic.height = int(pic.height * scale)
-        pic.width = int(pic.width * scale)
 
-    # -------- CENTER CHART HORIZONTALLY --------
-    pic.left = int((prs.slide_width - pic.width) / 2)
+def _discard(event: Dict[str, Any]):
+    pass
 
-    return slide
 
+async def _plan_slides(skeleton: Optional[Dict[str, Any]], enriched_research: Mapping[str, Any],
+                       theme_config: Optional[Dict[str, Any]], emit) -> Dict[str, Any]:
+    """Use the speculative plan if it still holds, else plan again; slides are emitted as they are planned."""
+    validation = enriched_research["validated"]
+    chart_plan = enriched_research["chart_plan"]
 
+    if skeleton is not None and _speculation_holds(validation):
+        slide_plan = _fill_slide_plan(skeleton, enriched_research)
+        for section in slide_plan["sections"]:
+            emit(_slide_event(section))
+    else:
+        async for kind, item in generate_slide_plan_stream(enriched_research, theme_config):
+            if kind == "slide":
+                emit(_slide_event(item))
+            else:
+                slide_plan = item
 
+    # Merge chart data
+    if chart_plan.get("chart_data"):
+        slide_plan.setdefault("chart_data", {})
+        slide_plan["chart_data"].update(chart_plan["chart_data"])
+    return slide_plan
 
-# -------------------------------------------------------------------
-# Animation helpers (unchanged from previous implementation)
-# -------------------------------------------------------------------
-def apply_slide_transition(slide):
-    transition = OxmlElement("p:transition")
-    transition.set("spd", "slow")
-    fade = OxmlElement("p:fade")
-    transition.append(fade)
-    slide_element = slide.element
-    insert_idx = 0
-    cSld = slide_element.find(qn("p:cSld"))
-    if cSld is not None:
-        insert_idx = slide_element.index(cSld) + 1
-    clrMapOvr = slide_element.find(qn("p:clrMapOvr"))
-    if clrMapOvr is not None:
-        insert_idx = slide_element.index(clrMapOvr) + 1
-    slide_element.insert(insert_idx, transition)
 
 # -------------------------------------------------------------------
-# Bullet Animations (placeholder)
+# Pipeline stage graph
 # -------------------------------------------------------------------
-def apply_bullet_animations(slide):
-    # (Implementation omitted for brevity – reuse previous logic)
-    pass
+# Each stage names the stages whose outputs it reads. run_dag starts every
+# stage as soon as its dependencies are done, so independent stages (the
+# speculative slide plan and the analysis agents) run side by side, and
+# only runs what the deck still needs: a checkpointed output is reused and
+# the stages behind it are skipped.
+@dataclass(slots=True, frozen=True)
+class Stage:
+    name: str
+    run: Callable[["PipelineRun"], Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+    checkpoint: bool = False
+
+
+class StageError(Exception):
+    """A stage failed; `error` is what it raised."""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage} stage failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+@dataclass
+class PipelineRun:
+    """Inputs of one pipeline run plus the stage outputs produced so far."""
+    topic: str
+    max_sources: int
+    theme_config: Optional[Dict[str, Any]]
+    emit: Callable[[Dict[str, Any]], None]
+    key: str
+    topic_embedding: Optional[List[float]] = None
+    outputs: Dict[str, Any] = field(default_factory=dict)
+
+    @cached_property
+    def summary_json(self) -> str:
+        # One serialisation of the summary for the slide plan and all agents
+        return canonical_json(self.outputs["research_summary"])
+
+
+async def _stage_sources(run: PipelineRun) -> List[Dict[str, Any]]:
+    sources = await _llm_thread(collect_sources, run.topic, run.max_sources)
+    run.emit({"status": "progress", "message": f"✅ Found {len(sources)} sources."})
+    return sources
+
+
+async def _stage_research_summary(run: PipelineRun) -> Dict[str, Any]:
+    run.emit({"status": "progress", "message": "🧠 Analyzing and summarizing content..."})
+    return await _llm_thread(build_research_summary, run.topic, run.outputs["sources"])
+
+
+async def _stage_skeleton(run: PipelineRun) -> Optional[Dict[str, Any]]:
+    # Speculative (see _plan_skeleton): a failure only means planning from scratch later
+    try:
+        return await _plan_skeleton(run.topic, run.outputs["research_summary"], run.theme_config,
+                                    run.topic_embedding, run.summary_json)
+    except Exception as e:
+        print(f"[SlidePlan] Speculative plan failed: {e}")
+        return None
 
 
-# -------------------------------------------------------------------
-# PPT generation with chart integration
-# -------------------------------------------------------------------
-def generate_ppt(topic: str, slide_plan: Dict[str, Any], output_dir: str, theme_config: Dict[str, Any] = None) -> (str, str):
-    from pptx import Presentation
-    from pptx.util import Inches
-    import os
-    from datetime import datetime
-
-    prs = Presentation()
-    prs.slide_width = Inches(13.333)
-    prs.slide_height = Inches(7.5)
-
-    title = slide_plan.get("title", topic)
-    subtitle = slide_plan.get("subtitle", "Auto-generated AI research deck")
-    sections = slide_plan.get("sections", [])
-    conclusion_bullets = slide_plan.get("conclusion_bullets", [])
-    sources = slide_plan.get("sources_used", [])
-    
-    # Use theme config from slide plan if not provided explicitly (fallback)
-    if not theme_config:
-        theme_config = slide_plan.get("theme_config", {})
-
-    # --------------------- Title Slide ---------------------
-    slide = _add_title_slide(prs, title, subtitle, theme_config)
-    apply_slide_transition(slide)
-
-    # --------------------- Content Sections ---------------------
-    for sec in sections:
-        slide = _add_bullet_slide(
-            prs,
-            sec.get("heading", "Section"),
-            sec.get("bullets", []),
-            theme_config
-        )
-        apply_bullet_animations(slide)
-        apply_slide_transition(slide)
-
-    # --------------------- Conclusion -----------------------
-    if conclusion_bullets:
-        slide = _add_bullet_slide(prs, "Key Takeaways", conclusion_bullets, theme_config)
-        apply_bullet_animations(slide)
-        apply_slide_transition(slide)
-
-    # --------------------- Sources --------------------------
-    if sources:
-        slide = _add_sources_slide(prs, sources, theme_config)
-        apply_slide_transition(slide)
-
-    # --------------------- Charts ---------------------------
-    chart_files = []
-    if "chart_data" in slide_plan:
-        try:
-            # Pass theme_config to generate_charts if supported (we will update it next)
-            chart_files = generate_charts(slide_plan, output_dir, theme_config)
+async def _stage_analysis(run: PipelineRun) -> Dict[str, Any]:
+    run.emit({"status": "progress", "message": "🧹 Validating insights, deriving chart data & drafting recommendations..."})
+    # Report each agent as it finishes rather than after the slowest one
+    analysis = {}
+    async for name, result in iter_analysis_agents(run.outputs["research_summary"], run.summary_json):
+        analysis[name] = result
+        run.emit({"status": "progress", "message": ANALYSIS_DONE_MESSAGES[name]})
+    return analysis
 
-            for cp in chart_files:
-                if os.path.exists(cp):
-                    slide = _add_chart_slide(prs, cp, theme_config)
-                    apply_slide_transition(slide)
 
-        except Exception as e:
-            print(f"[ChartGenerator] Error: {e}")
+async def _stage_slide_plan(run: PipelineRun) -> Dict[str, Any]:
+    run.emit({"status": "progress", "message": "📝 Generating slide plan..."})
+    validation, chart_plan, recommendations = (run.outputs["analysis"][name] for name in ANALYSIS_AGENTS)
+    # Layered over the summary instead of copied; flattened only when serialised
+    enriched_research = ChainMap(
+        {"validated": validation, "chart_plan": chart_plan, "recommendations": recommendations},
+        run.outputs["research_summary"],
+    )
+    return await _plan_slides(run.outputs["skeleton"], enriched_research, run.theme_config, run.emit)
 
-    # --------------------- Save PPT -------------------------
-    slug = _slugify(topic)
-    ts = datetime.now().strftime("%Y%m%d_%H%M")
-    filename = f"{slug}_{ts}.pptx"
 
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, filename)
+async def _stage_charts(run: PipelineRun) -> List[Tuple[str, bytes]]:
+    # Chart PNGs go straight from the render workers into the deck, never to disk
+    slide_plan = run.outputs["slide_plan"]
+    return await render_charts(slide_plan, settings.outputs_dir, run.theme_config or slide_plan.get("theme_config"))
 
-    prs.save(output_path)
 
-    return filename, output_path
+async def _stage_ppt(run: PipelineRun) -> Tuple[str, str]:
+    return await asyncio.get_running_loop().run_in_executor(
+        render_pool(), functools.partial(generate_ppt, chart_images=run.outputs["charts"]),
+        run.topic, run.outputs["slide_plan"], settings.outputs_dir, run.theme_config,
+    )
 
 
-# -------------------------------------------------------------------
-# Streaming pipeline (ASYNC GENERATOR) — MULTI-AGENT VERSION
-# -------------------------------------------------------------------
-async def run_research_pipeline_stream(topic: str, max_sources: int = 8, theme_config: Dict[str, Any] = None):
+# In dependency order; the last stage is the one the run is for
+PIPELINE_DAG: Tuple[Stage, ...] = (
+    Stage("sources", _stage_sources, checkpoint=True),
+    Stage("research_summary", _stage_research_summary, ("sources",), checkpoint=True),
+    Stage("skeleton", _stage_skeleton, ("research_summary",)),
+    Stage("analysis", _stage_analysis, ("research_summary",), checkpoint=True),
+    Stage("slide_plan", _stage_slide_plan, ("research_summary", "skeleton", "analysis"), checkpoint=True),
+    Stage("charts", _stage_charts, ("slide_plan",)),
+    Stage("ppt", _stage_ppt, ("slide_plan", "charts")),
+)
 
-    # Start
-    yield {"status": "start", "message": f"Starting research on: {topic}"}
-    await asyncio.sleep(0)
 
-    # ---------------------------------------------------------
-    # 1) SOURCE COLLECTION
-    # ---------------------------------------------------------
-    yield {"status": "progress", "message": "🔍 Searching the web..."}
-    await asyncio.sleep(0)
+async def run_dag(stages: Tuple[Stage, ...], run: PipelineRun, saved: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run `stages` (listed in dependency order) to produce the last one.
 
+    Outputs in `saved` are reused instead of recomputed; checkpointed stages
+    save theirs under the run key. The first failure cancels the rest and
+    is raised as a StageError. Unless the failure was the LLM provider's,
+    the checkpoints that fed the failed stage are dropped: a saved output
+    that breaks a later stage must not be replayed into every retry.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    needed = set()
+
+    def feeding_checkpoints(name: str) -> List[str]:
+        """Checkpointed stages whose outputs reach `name`, directly or via uncheckpointed ones."""
+        fed = []
+        for dep in by_name[name].deps:
+            fed.extend([dep] if by_name[dep].checkpoint else feeding_checkpoints(dep))
+        return fed
+
+    def need(name: str):
+        if name in needed or name in saved:
+            return
+        needed.add(name)
+        for dep in by_name[name].deps:
+            need(dep)
+
+    need(stages[-1].name)
+    run.outputs.update({name: value for name, value in saved.items() if name in by_name})
+
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def execute(stage: Stage):
+        for dep in stage.deps:
+            if dep in tasks:
+                await tasks[dep]
+        try:
+            value = await stage.run(run)
+        except Exception as e:
+            if not isinstance(e, (LLMUnavailableError, *LLM_RETRYABLE)):
+                await RESULT_CACHE.drop_checkpoints(run.key, feeding_checkpoints(stage.name))
+            raise StageError(stage.name, e) from e
+        run.outputs[stage.name] = value
+        if stage.checkpoint:
+            await RESULT_CACHE.set_checkpoint(run.key, stage.name, value)
+
+    for stage in stages:
+        if stage.name in needed:
+            tasks[stage.name] = asyncio.create_task(execute(stage))
     try:
-        sources = collect_sources(topic, max_results=max_sources)
-        yield {"status": "progress", "message": f"✅ Found {len(sources)} sources."}
-        await asyncio.sleep(0)
-    except Exception as e:
-        yield {"status": "error", "message": f"Search failed: {e}"}
-        await asyncio.sleep(0)
-        return
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return run.outputs
 
-    # ---------------------------------------------------------
-    # 2) RESEARCH SUMMARY AGENT
-    # ---------------------------------------------------------
-    yield {"status": "progress", "message": "🧠 Analyzing and summarizing content..."}
-    await asyncio.sleep(0)
-
-    research_summary = build_research_summary(topic, sources)
-
-    # ---------------------------------------------------------
-    # 3) VALIDATION AGENT
-    # ---------------------------------------------------------
-    yield {"status": "progress", "message": "🧹 Validating insights & cleaning output..."}
-    await asyncio.sleep(0)
-
-    validation = validate_research(research_summary)
-
-    # ---------------------------------------------------------
-    # 4) CHART PLANNING AGENT
-    # ---------------------------------------------------------
-    yield {"status": "progress", "message": "📊 Deriving chart data from research..."}
-    await asyncio.sleep(0)
-
-    chart_plan = plan_charts_from_research({
-        **research_summary,
-        "validated": validation
-    })
-
-    # ---------------------------------------------------------
-    # 5) RECOMMENDATION AGENT
-    # ---------------------------------------------------------
-    yield {"status": "progress", "message": "📌 Generating executive recommendations..."}
-    await asyncio.sleep(0)
-
-    recommendations = generate_recommendations({
-        **research_summary,
-        "validated": validation
-    })
-
-    # ---------------------------------------------------------
-    # 6) MERGE AGENT OUTPUTS → ENRICHED RESEARCH
-    # ---------------------------------------------------------
-    enriched_research = {
-        **research_summary,
-        "validated": validation,
-        "chart_plan": chart_plan,
-        "recommendations": recommendations,
-    }
-
-    # ---------------------------------------------------------
-    # 7) SLIDE PLAN AGENT
-    # ---------------------------------------------------------
-    yield {"status": "progress", "message": "📝 Generating slide plan..."}
-    await asyncio.sleep(0)
 
-    slide_plan = generate_slide_plan(enriched_research, theme_config)
-
-    # Merge chart data
-    if chart_plan.get("chart_data"):
-        slide_plan.setdefault("chart_data", {})
-        slide_plan["chart_data"].update(chart_plan["chart_data"])
+async def _run_core(topic: str, max_sources: int, theme_config: Optional[Dict[str, Any]],
+                    emit: Callable[[Dict[str, Any]], None] = _discard) -> Dict[str, Any]:
+    """
+    The pipeline stages. Progress goes to `emit`; the DONE event is emitted
+    and returned; when the pipeline stops early the error event is returned.
 
-    # ---------------------------------------------------------
-    # 8) Generate PPT
-    # ---------------------------------------------------------
-    filename, ppt_path = generate_ppt(topic, slide_plan, settings.outputs_dir, theme_config)
+    The stages themselves are PIPELINE_DAG. Their outputs are checkpointed
+    under the run key until the deck is built, so re-running a request that
+    failed part-way skips the stages that already finished.
+    """
+    run_key = result_cache_key(topic, max_sources, theme_config)
+    saved = await RESULT_CACHE.get_checkpoints(run_key)
 
-    # ---------------------------------------------------------
-    # 9) Final DONE event
-    # ---------------------------------------------------------
-    yield {
+    # Start
+    emit({"status": "start", "message": f"Starting research on: {topic}"})
+    if saved:
+        emit({"status": "progress", "message": "♻️ Resuming from the stages an earlier attempt finished."})
+
+    # Identical (or paraphrased) request answered before: hand back the stored deck.
+    # Source collection waits for this: a worker thread can't be cancelled, so
+    # starting it early would pay for an LLM call on every cache hit.
+    cache_key = run_key if results_cacheable() else None
+    scope = result_scope(max_sources, theme_config)
+    topic_embedding = None
+    if cache_key:
+        cached = await RESULT_CACHE.get(cache_key)
+        if not cached:
+            topic_embedding = await _embed_topic(topic)
+            if topic_embedding is not None:
+                cached = await RESULT_CACHE.get_similar(topic_embedding, scope)
+        if cached and os.path.exists(cached["ppt_path"]):
+            emit({"status": "progress", "message": "♻️ Reusing the deck from an earlier request on this topic."})
+            result = {**cached, "status": "DONE", "message": "Pipeline completed (cached)"}
+            emit(result)
+            return result
+
+    emit({"status": "progress", "message": "🔍 Searching the web..."})
+
+    run = PipelineRun(topic, max_sources, theme_config, emit, run_key, topic_embedding)
+    try:
+        outputs = await run_dag(PIPELINE_DAG, run, saved)
+    except StageError as e:
+        if e.stage != "sources" or isinstance(e.error, LLMUnavailableError):
+            raise e.error
+        error = {"status": "error", "message": f"Search failed: {e.error}"}
+        emit(error)
+        return error
+    filename, ppt_path = outputs["ppt"]
+
+    if cache_key:
+        # Copy to a cache-addressed name so the cached entry outlives this run's file
+        cached_filename = f"{slugify(topic)}_{cache_key[:16]}.pptx"
+        cached_path = os.path.join(settings.outputs_dir, cached_filename)
+        await asyncio.to_thread(shutil.copyfile, ppt_path, cached_path)
+        await RESULT_CACHE.set(cache_key, {"ppt_filename": cached_filename, "ppt_path": cached_path, "topic": topic})
+        if topic_embedding is not None:
+            await RESULT_CACHE.add_topic(topic_embedding, scope, cache_key)
+    await RESULT_CACHE.clear_checkpoints(run_key)
+
+    # Final DONE event
+    result = {
         "status": "DONE",
         "message": "Pipeline completed",
         "ppt_filename": filename,
         "ppt_path": ppt_path,
         "topic": topic
     }
+    emit(result)
+    return result
+
 
+# -------------------------------------------------------------------
+# In-flight request coalescing
+# -------------------------------------------------------------------
+# A request identical to one still running (same result cache key) follows
+# that run instead of starting its own: it replays the events so far, then
+# gets the live ones and the same deck. A run is cancelled once its last
+# follower has gone. Progress is only recorded once a streaming follower has
+# joined; until then, non-streaming callers just wait for the task's result.
+class _Flight(EventLog):
+    def __init__(self, key: str):
+        super().__init__()
+        self.key = key
+        self.followers = 0
+        self.recording = False
+        self.error: Optional[Exception] = None
+        self.task: Optional[asyncio.Task] = None
 
+    def emit(self, event: Dict[str, Any]):
+        if self.recording:
+            self.publish(event)
 
 
+_INFLIGHT: Dict[str, _Flight] = {}
 
 
+async def _fly(flight: _Flight, topic: str, max_sources: int, theme_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        return await _run_core(topic, max_sources, theme_config, flight.emit)
+    except LLMUnavailableError as e:
+        flight.error = e
+        flight.publish({"status": "error", "message": f"LLM provider unavailable: {e}"})
+    except Exception as e:
+        flight.error = e
+        flight.publish({"status": "error", "message": str(e)})
+    finally:
+        if _INFLIGHT.get(flight.key) is flight:
+            del _INFLIGHT[flight.key]
+        flight.close()
+    return {}
+
+
+def _join_flight(topic: str, max_sources: int, theme_config: Optional[Dict[str, Any]],
+                 streaming: bool = False) -> _Flight:
+    key = result_cache_key(topic, max_sources, theme_config)
+    flight = _INFLIGHT.get(key)
+    if flight is None:
+        flight = _INFLIGHT[key] = _Flight(key)
+        flight.task = asyncio.create_task(_fly(flight, topic, max_sources, theme_config))
+    if streaming:
+        # A stream joining a non-streaming run gets its events from here on
+        flight.recording = True
+    flight.followers += 1
+    return flight
+
+
+def _leave_flight(flight: _Flight):
+    flight.followers -= 1
+    if flight.followers == 0 and not flight.closed:
+        # Nobody is waiting any more; later requests must not join a cancelled run
+        if _INFLIGHT.get(flight.key) is flight:
+            del _INFLIGHT[flight.key]
+        flight.task.cancel()
+
+
+async def run_research_pipeline_stream(topic: str, max_sources: int = 8, theme_config: Dict[str, Any] = None):
+    """
+    Yield the pipeline's events. The stages run in their own task, shared
+    with identical requests in flight, so a slow consumer delays its own
+    delivery but never the pipeline. A crash arrives as an error event.
+    """
+    flight = _join_flight(topic, max_sources, theme_config, streaming=True)
+    try:
+        async for event in flight.follow():
+            yield event
+    finally:
+        _leave_flight(flight)
 
 
 async def run_research_pipeline(topic: str, max_sources: int = 8, theme_config: Dict[str, Any] = None) -> Dict[str, Any]:
     """
-    Wrapper to run the streaming pipeline and return the final result.
+    Run the pipeline (or join the identical run in flight) and return the final result.
     """
-    final_result = {}
-    async for event in run_research_pipeline_stream(topic, max_sources, theme_config):
-        if event["status"] == "DONE":
-            final_result = event
-    return final_result
+    flight = _join_flight(topic, max_sources, theme_config)
+    try:
+        result = await asyncio.shield(flight.task)
+    finally:
+        _leave_flight(flight)
+    if flight.error is not None:
+        raise flight.error
+    return result
@@ -0,0 +1,7 @@
+import os
+
+# Settings are read when the app modules are first imported: give them a key
+# and keep the on-disk caches out of the tests
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+for name in ("LLM_CACHE_DIR", "SCRAPE_CACHE_DIR", "RESULT_CACHE_DIR", "PLAN_TEMPLATE_DIR"):
+    os.environ[name] = ""
@@ -0,0 +1,112 @@
+import httpx
+import openai
+import pytest
+from tenacity import wait_none
+
+from app.services import pipeline
+from app.services.pipeline import CircuitBreaker, LLMUnavailableError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pipeline.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _fail(breaker, times):
+    for _ in range(times):
+        breaker.record(False)
+
+
+def test_opens_after_fail_max_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+    _fail(breaker, 2)
+    breaker.check()
+    breaker.record(False)
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+    _fail(breaker, 2)
+    breaker.record(True)
+    _fail(breaker, 2)
+    breaker.check()
+
+
+def test_half_open_after_reset_timeout(clock):
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+    _fail(breaker, 3)
+    clock[0] += 29
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
+    clock[0] += 1
+    breaker.check()
+    # One failure while half-open re-opens the breaker
+    breaker.record(False)
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
+
+
+def test_success_while_half_open_closes(clock):
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+    _fail(breaker, 3)
+    clock[0] += 30
+    breaker.check()
+    breaker.record(True)
+    _fail(breaker, 2)
+    breaker.check()
+
+
+def test_trip_opens_immediately(clock):
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+    breaker.trip()
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
+    clock[0] += 30
+    breaker.check()
+
+
+def _rate_limit(code):
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+    return openai.RateLimitError("rate limited", response=response, body={"code": code})
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("test", fail_max=5, reset_timeout=30)
+    monkeypatch.setattr(pipeline, "OPENAI_BREAKER", breaker)
+    monkeypatch.setattr(pipeline, "wait_random_exponential", lambda **kwargs: wait_none())
+    return breaker
+
+
+def test_resilient_retries_transient_errors(breaker):
+    calls = []
+
+    @pipeline.resilient
+    def call():
+        calls.append(1)
+        if len(calls) < pipeline.LLM_ATTEMPTS:
+            raise _rate_limit("rate_limit_exceeded")
+        return "ok"
+
+    assert call() == "ok"
+    assert len(calls) == pipeline.LLM_ATTEMPTS
+    assert breaker._failures == 0
+
+
+def test_resilient_fails_fast_on_exhausted_quota(breaker):
+    calls = []
+
+    @pipeline.resilient
+    def call():
+        calls.append(1)
+        raise _rate_limit("insufficient_quota")
+
+    with pytest.raises(LLMUnavailableError):
+        call()
+    assert len(calls) == 1
+    with pytest.raises(LLMUnavailableError):
+        breaker.check()
@@ -0,0 +1,33 @@
+import pytest
+
+from app.services import pipeline
+from app.services.pipeline import _dedupe_sources
+
+pytest.importorskip("datasketch")
+
+ARTICLE = " ".join(f"word{i}" for i in range(300))
+
+
+def _source(url, content):
+    return {"url": url, "title": url, "content": content}
+
+
+def test_near_duplicates_keep_the_longest_copy_in_order():
+    sources = [
+        _source("a", "An unrelated article about " + " ".join(f"other{i}" for i in range(200))),
+        _source("b", ARTICLE),
+        _source("c", ARTICLE + " plus a syndicated footer"),
+        _source("d", ""),
+    ]
+    assert [s["url"] for s in _dedupe_sources(sources)] == ["a", "c", "d"]
+
+
+def test_distinct_sources_are_kept():
+    sources = [_source(str(n), " ".join(f"topic{n}word{i}" for i in range(100))) for n in range(4)]
+    assert _dedupe_sources(sources) == sources
+
+
+def test_noop_without_datasketch(monkeypatch):
+    monkeypatch.setattr(pipeline, "MinHashLSH", None)
+    sources = [_source("a", ARTICLE), _source("b", ARTICLE)]
+    assert _dedupe_sources(sources) == sources
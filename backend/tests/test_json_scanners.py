@@ -0,0 +1,58 @@
+import orjson
+
+from app.services.pipeline import _JsonObjectScanner, _SectionScanner
+
+
+def test_object_scanner_stops_after_top_level_object():
+    text = '{"a": {"b": [1, 2]}} and then some prose'
+    assert _JsonObjectScanner().feed(text) == text.index("}}") + 2
+
+
+def test_object_scanner_ignores_braces_and_escaped_quotes_in_strings():
+    text = '{"a": "}{ \\" }", "b": "\\\\"}'
+    assert _JsonObjectScanner().feed(text) == len(text)
+
+
+def test_object_scanner_skips_text_before_the_object():
+    text = 'Sure } "here" it is: {"a": 1}'
+    assert _JsonObjectScanner().feed(text) == len(text)
+
+
+def test_object_scanner_keeps_state_across_chunks():
+    scanner = _JsonObjectScanner()
+    assert scanner.feed('{"a": "x\\') == -1
+    assert scanner.feed('"}"') == -1  # escaped quote: the brace is still inside the string
+    assert scanner.feed(', "b": {}') == -1
+    assert scanner.feed("}tail") == 1
+
+
+def test_object_scanner_reports_incomplete_object():
+    assert _JsonObjectScanner().feed('{"a": [1, 2') == -1
+
+
+PLAN = (
+    '{"title": "T {x}", "meta": {"sections": [{"heading": "nested"}]}, '
+    '"sections": [{"heading": "A", "bullets": ["a}", "b\\"]"]}, {"heading": "B", "bullets": []}], '
+    '"conclusion_bullets": []}'
+)
+
+
+def test_section_scanner_yields_top_level_sections():
+    assert _SectionScanner().feed(PLAN) == orjson.loads(PLAN)["sections"]
+
+
+def test_section_scanner_is_chunking_independent():
+    expected = orjson.loads(PLAN)["sections"]
+    for size in (1, 2, 3, 7, 16):
+        scanner = _SectionScanner()
+        found = []
+        for i in range(0, len(PLAN), size):
+            found.extend(scanner.feed(PLAN[i:i + size]))
+        assert found == expected, size
+
+
+def test_section_scanner_reports_each_section_once_complete():
+    scanner = _SectionScanner()
+    assert scanner.feed('{"sections": [{"heading": "A"}, {"heading": ') == [{"heading": "A"}]
+    assert scanner.feed('"B"}') == [{"heading": "B"}]
+    assert scanner.feed("]}") == []
@@ -0,0 +1,36 @@
+import re
+
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Inches
+
+from app.core.ppt import ppt_generator
+from app.core.ppt.ppt_generator import ThemeCtx, _fast_append_bullets
+
+TEXTS = ["• Plain bullet", "• Needs <escaping> & \"quotes\"", "• Ünïcödé — 42%"]
+
+
+def _bullet_xml(texts, ctx):
+    slide = Presentation().slides.add_slide(Presentation().slide_layouts[6])
+    text_frame = slide.shapes.add_textbox(0, 0, Inches(4), Inches(4)).text_frame
+    text_frame.clear()
+    _fast_append_bullets(text_frame, texts, ctx)
+    return [etree.tostring(p, method="c14n") for p in text_frame._txBody.p_lst]
+
+
+def test_fast_path_matches_the_paragraph_api(monkeypatch):
+    ctx = ThemeCtx.from_config({"font_family": "Georgia \"Pro\"", "background_color": "#FAFAFA"})
+    fast = _bullet_xml(TEXTS, ctx)
+    # A pattern that matches everything sends all text through python-pptx
+    monkeypatch.setattr(ppt_generator, "_SPECIAL_TEXT", re.compile(""))
+    slow = _bullet_xml(TEXTS, ctx)
+
+    # clear() leaves one empty paragraph before the bullets
+    assert len(fast) == len(TEXTS) + 1
+    assert fast == slow
+
+
+def test_line_breaks_take_the_paragraph_api():
+    ctx = ThemeCtx.from_config(None)
+    paragraphs = _bullet_xml(["• one\ntwo", "• three"], ctx)
+    assert b"<a:br" in paragraphs[1]
@@ -0,0 +1,105 @@
+import asyncio
+
+from app.api.routes.progress import _STREAM_END, _next_batch, _produce_events
+
+
+async def _events(items, error=None):
+    for item in items:
+        yield item
+    if error is not None:
+        raise error
+
+
+async def _drain(queue):
+    events = []
+    finished = False
+    while not finished:
+        batch, finished = await _next_batch(queue)
+        events.extend(batch)
+    return events
+
+
+def test_next_batch_drains_what_is_queued():
+    async def scenario():
+        queue = asyncio.Queue()
+        for i in range(3):
+            queue.put_nowait(i)
+        assert await _next_batch(queue) == ([0, 1, 2], False)
+
+        waiter = asyncio.create_task(_next_batch(queue))
+        await asyncio.sleep(0)
+        assert not waiter.done()  # blocks until there is something to send
+        queue.put_nowait(3)
+        queue.put_nowait(_STREAM_END)
+        assert await waiter == ([3], True)
+
+    asyncio.run(scenario())
+
+
+def test_events_are_numbered_without_touching_the_originals():
+    source = [{"status": "step"}, {"status": "step"}, {"status": "DONE"}]
+
+    async def scenario():
+        queue = asyncio.Queue(maxsize=8)
+        await _produce_events(queue, _events(source))
+        return await _drain(queue)
+
+    events = asyncio.run(scenario())
+    assert [event["seq"] for event in events] == [1, 2, 3]
+    assert all("seq" not in event for event in source)
+
+
+def test_slow_client_drops_progress_but_not_the_terminal_event():
+    source = [{"status": "step", "n": n} for n in range(5)] + [{"status": "DONE"}]
+
+    async def scenario():
+        queue = asyncio.Queue(maxsize=3)
+        producer = asyncio.create_task(_produce_events(queue, _events(source)))
+        await asyncio.sleep(0.01)
+        assert not producer.done()  # waiting for room for the drop marker and DONE
+        events = await _drain(queue)
+        await producer
+        return events
+
+    events = asyncio.run(scenario())
+    assert events == [
+        {"status": "step", "n": 0, "seq": 1},
+        {"status": "step", "n": 1, "seq": 2},
+        {"status": "step", "n": 2, "seq": 3},
+        {"dropped": 2, "last_seq": 5},
+        {"status": "DONE", "seq": 6},
+    ]
+
+
+def test_drop_marker_precedes_the_next_progress_event_that_fits():
+    async def scenario():
+        queue = asyncio.Queue(maxsize=2)
+        gate = asyncio.Event()
+
+        async def events():
+            for n in range(4):
+                yield {"status": "step", "n": n}
+            await gate.wait()
+            yield {"status": "step", "n": 4}
+
+        producer = asyncio.create_task(_produce_events(queue, events()))
+        await asyncio.sleep(0.01)
+        first, _ = await _next_batch(queue)
+        gate.set()
+        rest = await _drain(queue)
+        await producer
+        return first, rest
+
+    first, rest = asyncio.run(scenario())
+    assert [event["seq"] for event in first] == [1, 2]
+    assert rest == [{"dropped": 2, "last_seq": 4}, {"status": "step", "n": 4, "seq": 5}]
+
+
+def test_source_failure_becomes_an_error_event():
+    async def scenario():
+        queue = asyncio.Queue(maxsize=8)
+        await _produce_events(queue, _events([{"status": "step"}], RuntimeError("pipeline broke")))
+        return await _drain(queue)
+
+    events = asyncio.run(scenario())
+    assert events[-1] == {"status": "error", "message": "pipeline broke"}
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from app.services import pipeline
+from app.services.pipeline import LLMUnavailableError, PipelineRun, Stage, StageError, run_dag
+
+
+class FakeResultCache:
+    def __init__(self):
+        self.saved = {}
+        self.dropped = []
+
+    async def set_checkpoint(self, run_key, stage, value):
+        self.saved[stage] = value
+
+    async def drop_checkpoints(self, run_key, stages):
+        self.dropped.extend(stages)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeResultCache()
+    monkeypatch.setattr(pipeline, "RESULT_CACHE", cache)
+    return cache
+
+
+def _run():
+    return PipelineRun("topic", 3, None, lambda event: None, "run-key")
+
+
+def _stage(name, log, deps=(), checkpoint=False, delay=0.01, error=None):
+    async def body(run):
+        log.append(("start", name))
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        log.append(("end", name))
+        return [run.outputs[dep] for dep in deps] + [name]
+
+    return Stage(name, body, deps, checkpoint)
+
+
+def _diamond(log, **overrides):
+    """a -> (b, c) -> d; keyword arguments override one stage, e.g. c={"error": ...}."""
+    specs = {"a": {}, "b": {"deps": ("a",)}, "c": {"deps": ("a",)}, "d": {"deps": ("b", "c")}}
+    return tuple(_stage(name, log, **{**spec, **overrides.get(name, {})}) for name, spec in specs.items())
+
+
+def test_stages_start_after_their_dependencies(cache):
+    log = []
+    outputs = asyncio.run(run_dag(_diamond(log), _run(), {}))
+
+    assert outputs["d"] == [[["a"], "b"], [["a"], "c"], "d"]
+    for stage, deps in (("b", "a"), ("c", "a"), ("d", "bc")):
+        for dep in deps:
+            assert log.index(("end", dep)) < log.index(("start", stage))
+    # b and c only share a dependency, so they overlap
+    assert log.index(("start", "c")) < log.index(("end", "b"))
+
+
+def test_saved_outputs_skip_their_stage_and_its_upstream(cache):
+    log = []
+    outputs = asyncio.run(run_dag(_diamond(log), _run(), {"b": "saved-b", "c": "saved-c"}))
+
+    assert [name for event, name in log if event == "start"] == ["d"]
+    assert outputs["d"] == ["saved-b", "saved-c", "d"]
+
+
+def test_only_checkpoint_stages_are_saved(cache):
+    log = []
+    asyncio.run(run_dag(_diamond(log, b={"checkpoint": True}), _run(), {}))
+
+    assert cache.saved == {"b": [["a"], "b"]}
+
+
+def test_failure_cancels_running_stages_and_skips_dependents(cache):
+    log = []
+    stages = _diamond(log, b={"delay": 1}, c={"error": ValueError("boom")})
+
+    with pytest.raises(StageError) as raised:
+        asyncio.run(run_dag(stages, _run(), {}))
+
+    assert raised.value.stage == "c"
+    assert isinstance(raised.value.error, ValueError)
+    assert ("end", "b") not in log
+    assert ("start", "d") not in log
+
+
+def test_failure_drops_the_checkpoints_that_fed_it(cache):
+    log = []
+    stages = (
+        _stage("a", log, checkpoint=True),
+        _stage("b", log, deps=("a",)),
+        _stage("c", log, checkpoint=True),
+        _stage("d", log, deps=("b", "c"), error=ValueError("bad input")),
+    )
+
+    with pytest.raises(StageError):
+        asyncio.run(run_dag(stages, _run(), {}))
+
+    assert cache.dropped == ["a", "c"]
+
+
+@pytest.mark.parametrize("error", [LLMUnavailableError("down"), pipeline.IncompleteJSONError("truncated")])
+def test_provider_failures_keep_checkpoints(cache, error):
+    log = []
+    stages = _diamond(log, a={"checkpoint": True}, d={"error": error})
+
+    with pytest.raises(StageError):
+        asyncio.run(run_dag(stages, _run(), {}))
+
+    assert cache.dropped == []
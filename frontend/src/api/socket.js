@@ -1,5 +1,15 @@
 // src/api/socket.js
 
 export function connectWebSocket() {
-    return new WebSocket("ws://localhost:8000/ws/progress");
+    const ws = new WebSocket("ws://localhost:8000/ws/progress");
+    // Progress frames are orjson-encoded bytes; receive them as ArrayBuffers
+    ws.binaryType = "arraybuffer";
+    return ws;
+}
+
+const decoder = new TextDecoder();
+
+export function parseMessage(event) {
+    const text = typeof event.data === "string" ? event.data : decoder.decode(event.data);
+    return JSON.parse(text);
 }
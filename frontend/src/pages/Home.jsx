@@ -2,7 +2,7 @@ import React, { useState } from "react";
 import InputBox from "../components/InputBox";
 import OutputBox from "../components/OutputBox";
 import Loader from "../components/Loader";
-import { connectWebSocket } from "../api/socket";
+import { connectWebSocket, parseMessage } from "../api/socket";
 import ChartPreviewGrid from "../components/ChartPreviewGrid";
 
 function Home() {
@@ -25,9 +25,7 @@ function Home() {
 
     const ws = await connectWebSocket(topic);
 
-    ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-
+    const handleEvent = (data) => {
       // Update generic progress message
       if (data.message) {
         setProgress(data.message);
@@ -50,6 +48,14 @@ function Home() {
         ws.close();
       }
     };
+
+    ws.onmessage = (event) => {
+      const data = parseMessage(event);
+
+      // The backend coalesces bursts into {"batch": [...]} frames
+      const events = Array.isArray(data.batch) ? data.batch : [data];
+      events.forEach(handleEvent);
+    };
   };
 
   return (